@@ -0,0 +1,220 @@
+"""
+Admission control for upstream-bound endpoints.
+
+Each provider (OpenAI, Perplexity) gets one AdmissionController:
+
+- a per-user token bucket (USER_RATE_PER_MINUTE, bursting to USER_BURST), keyed on
+  the ADMISSION_USER_HEADER header, else the request's userName, else the client IP;
+- a global limit on requests holding an upstream slot at once;
+- a bounded wait queue served round-robin across users, so one user's burst
+  waits behind everyone else's next request instead of in front of it.
+
+Requests that are over their rate, can't be queued, or wait longer than
+ADMISSION_MAX_WAIT are rejected with AdmissionRejected (429 + Retry-After).
+
+State is in-process: every worker process enforces its own buckets and slots.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from metrics import ADMISSION_QUEUED, ADMISSION_REJECTED
+from research_prefetch import RateBudget
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_USER_HEADER = os.getenv("ADMISSION_USER_HEADER", "X-User-Id")
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", "20"))
+# A full /generate-linkedin/batch (LINKEDIN_BATCH_MAX_VARIANTS, 8) plus a few single
+# generations, so regenerating all variants right after a post or stream still fits
+USER_BURST = float(os.getenv("USER_BURST", "12"))
+MAX_TRACKED_USERS = 10000
+
+PROVIDER_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "32")),
+    "perplexity": int(os.getenv("PERPLEXITY_MAX_CONCURRENCY", "16")),
+}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Too many requests ({reason}); retry in {math.ceil(retry_after)}s")
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Ticket:
+    """A granted upstream slot. `release` is idempotent."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+        self.granted_at = time.monotonic()
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(time.monotonic() - self.granted_at)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        max_wait: float = ADMISSION_MAX_WAIT,
+        rate_per_minute: float = USER_RATE_PER_MINUTE,
+        burst: float = USER_BURST,
+    ):
+        self.provider = provider
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.active = 0
+        self.queued = 0
+        # user -> FIFO of waiters; dict order is the round-robin order
+        self._waiting: "OrderedDict[str, deque]" = OrderedDict()
+        self._buckets: "OrderedDict[str, RateBudget]" = OrderedDict()
+        self._avg_hold = 5.0  # EWMA of seconds a slot is held, for Retry-After estimates
+
+    def _bucket(self, user: str) -> RateBudget:
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            bucket = self._buckets[user] = RateBudget(self.rate_per_minute, burst=self.burst)
+            if len(self._buckets) > MAX_TRACKED_USERS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user)
+        return bucket
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        ADMISSION_REJECTED.inc(self.provider, reason)
+        return AdmissionRejected(reason, retry_after)
+
+    def charge(self, user: str, cost: int = 1) -> None:
+        """Take `cost` tokens from the user's bucket (all or none) or raise AdmissionRejected."""
+        if cost > self.burst:
+            raise self._reject("over_burst", cost / (self.rate_per_minute / 60.0))
+        wait = self._bucket(user).try_acquire(cost)
+        if wait > 0:
+            raise self._reject("user_rate", wait)
+
+    async def acquire(self, user: str, charge: bool = True) -> Ticket:
+        """Wait for a slot (fairly) or raise AdmissionRejected. `charge=False` skips the user's rate bucket."""
+        if charge:
+            self.charge(user)
+
+        if self.active < self.max_concurrency and not self._waiting:
+            self.active += 1
+            return Ticket(self)
+
+        if self.queued >= self.queue_size:
+            backlog = (self.queued + 1) / self.max_concurrency
+            raise self._reject("queue_full", backlog * self._avg_hold)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(user, deque()).append(future)
+        self._set_queued(self.queued + 1)
+        # asyncio.wait, not wait_for: on 3.11 wait_for swallows a cancellation that
+        # races with the grant, leaving a cancelled request running with a slot
+        try:
+            done, _ = await asyncio.wait((future,), timeout=self.max_wait)
+        except asyncio.CancelledError:
+            self._abandon(user, future)
+            raise
+        if not done:
+            self._abandon(user, future)
+            raise self._reject("queue_timeout", self._avg_hold)
+        return Ticket(self)
+
+    def _abandon(self, user: str, future: asyncio.Future) -> None:
+        if future.done() and not future.cancelled():
+            # Granted just as we gave up — hand the slot on
+            self._release(0.0, hold_sample=False)
+        else:
+            future.cancel()
+            self._forget(user, future)
+
+    def _set_queued(self, value: int) -> None:
+        self.queued = value
+        ADMISSION_QUEUED.set(self.provider, value=value)
+
+    def _forget(self, user: str, future: asyncio.Future) -> None:
+        waiters = self._waiting.get(user)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            self._set_queued(self.queued - 1)
+            if not waiters:
+                del self._waiting[user]
+
+    def _release(self, held: float, hold_sample: bool = True) -> None:
+        if hold_sample:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+        # Hand the slot straight to the next user in round-robin order
+        while self._waiting:
+            user, waiters = self._waiting.popitem(last=False)
+            future = waiters.popleft()
+            self._set_queued(self.queued - 1)
+            if waiters:
+                self._waiting[user] = waiters  # back of the line
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "maxConcurrency": self.max_concurrency,
+            "queued": self.queued,
+            "queueSize": self.queue_size,
+            "waitingUsers": len(self._waiting),
+        }
+
+
+controllers = {provider: AdmissionController(provider, limit) for provider, limit in PROVIDER_CONCURRENCY.items()}
+
+
+def user_key(headers, user_name: Optional[str] = None, client_host: Optional[str] = None) -> str:
+    """Who to charge a request to: explicit header, then userName, then client IP."""
+    header = headers.get(ADMISSION_USER_HEADER)
+    if header:
+        return f"id:{header}"
+    if user_name and user_name != "Guest":
+        return f"name:{user_name.strip().lower()}"
+    return f"ip:{client_host or 'unknown'}"
+
+
+def charge(provider: str, user: str, cost: int = 1) -> None:
+    """Charge `user`'s rate bucket on `provider` without taking a slot (e.g. when queueing a job)."""
+    if ADMISSION_ENABLED:
+        controllers[provider].charge(user, cost)
+
+
+async def acquire(provider: str, user: str, charge: bool = True) -> Optional[Ticket]:
+    """Acquire a slot for `user` on `provider`; None when admission control is disabled."""
+    if not ADMISSION_ENABLED:
+        return None
+    return await controllers[provider].acquire(user, charge=charge)
+
+
+@asynccontextmanager
+async def admit(provider: str, user: str, charge: bool = True) -> AsyncIterator[None]:
+    ticket = await acquire(provider, user, charge=charge)
+    try:
+        yield
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+
+def stats() -> dict:
+    return {provider: controller.stats() for provider, controller in controllers.items()}
@@ -0,0 +1,203 @@
+"""
+Artifact store — transcripts, research results and generated posts, kept locally.
+
+Artifacts are content-addressed: the id is derived from the kind and a SHA-256 of
+the body, so storing the same transcript twice keeps one body and returns the
+same id. Clients send `transcript_id` instead of re-uploading a transcript on
+every regeneration. Who stored it, from which session and under which parent is
+recorded separately in `artifact_links`, one row per distinct (artifact, user,
+session, parent), so two users storing the same text each see it in their own
+history. Reads are always scoped to the caller: an artifact the caller has no
+link to is treated as missing, even if its id (a hash of the body) is known.
+Lookups go through SQLite indexes on (kind, content hash), user,
+session and parent artifact, so they stay O(log n) as history grows.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from storage import DATA_DIR, open_sqlite
+
+ARTIFACT_DB_PATH = os.getenv("ARTIFACT_DB_PATH", os.path.join(DATA_DIR, "artifacts.sqlite3"))
+ARTIFACT_LIST_LIMIT = 100
+
+TRANSCRIPT, RESEARCH, POST = "transcript", "research", "post"
+KINDS = (TRANSCRIPT, RESEARCH, POST)
+_ID_PREFIX = {TRANSCRIPT: "tr_", RESEARCH: "rs_", POST: "po_"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS artifacts_kind_hash ON artifacts (kind, content_hash);
+CREATE TABLE IF NOT EXISTS artifact_links (
+    artifact_id TEXT NOT NULL REFERENCES artifacts (id),
+    kind TEXT NOT NULL,
+    user_key TEXT,
+    session_id TEXT,
+    parent_id TEXT,
+    meta TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS artifact_links_owner
+    ON artifact_links (artifact_id, IFNULL(user_key, ''), IFNULL(session_id, ''), IFNULL(parent_id, ''));
+CREATE INDEX IF NOT EXISTS artifact_links_user ON artifact_links (user_key, kind, created_at);
+CREATE INDEX IF NOT EXISTS artifact_links_session ON artifact_links (session_id, kind, created_at);
+CREATE INDEX IF NOT EXISTS artifact_links_parent ON artifact_links (parent_id, created_at);
+"""
+
+SUMMARY_COLUMNS = (
+    "a.id, a.kind, a.content_hash, l.user_key, l.session_id, l.parent_id, l.meta, a.size, l.created_at"
+)
+
+
+def content_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def encode_body(value) -> str:
+    """Stable text form for JSON artifacts (research results, posts) so equal values hash equally."""
+    return value if isinstance(value, str) else json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+class ArtifactStore:
+    def __init__(self, path: str = ARTIFACT_DB_PATH):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+
+    def open(self) -> None:
+        if self._db is None:
+            self._db = open_sqlite(self.path, SCHEMA)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        self.open()
+        return self._db
+
+    def put(
+        self,
+        kind: str,
+        body,
+        user_key: Optional[str] = None,
+        session_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        meta: Optional[dict] = None,
+    ) -> str:
+        """
+        Store an artifact and return its id. Identical content is stored once; each
+        new (user, session, parent) combination adds a link to it.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown artifact kind '{kind}'")
+        text = encode_body(body)
+        digest = content_hash(text)
+        new_id = _ID_PREFIX[kind] + digest[:32]
+        now = time.time()
+        # Body first: a link never points at a missing body
+        self.db.execute(
+            "INSERT OR IGNORE INTO artifacts (id, kind, content_hash, body, size, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (new_id, kind, digest, text, len(text), now),
+        )
+        self.db.execute(
+            "INSERT OR IGNORE INTO artifact_links"
+            " (artifact_id, kind, user_key, session_id, parent_id, meta, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (new_id, kind, user_key, session_id, parent_id, json.dumps(meta or {}, ensure_ascii=False), now),
+        )
+        return new_id
+
+    def get(self, artifact_id: str, user_key: str, kind: Optional[str] = None) -> Optional[dict]:
+        """
+        Full artifact including `body` (decoded from JSON for research and posts)
+        and `links`, the (session, parent) combinations `user_key` stored it under,
+        oldest first. None when `user_key` never stored it.
+        """
+        row = self.db.execute("SELECT * FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+        if row is None or (kind is not None and row["kind"] != kind):
+            return None
+        links = self.db.execute(
+            "SELECT user_key, session_id, parent_id, meta, created_at FROM artifact_links"
+            " WHERE artifact_id = ? AND user_key = ? ORDER BY created_at",
+            (artifact_id, user_key),
+        ).fetchall()
+        if not links:
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "contentHash": row["content_hash"],
+            "size": row["size"],
+            "createdAt": row["created_at"],
+            "links": [self._link(link) for link in links],
+            "body": row["body"] if row["kind"] == TRANSCRIPT else json.loads(row["body"]),
+        }
+
+    def get_transcript(self, artifact_id: str, user_key: str) -> Optional[str]:
+        """The transcript's text, if `user_key` stored it."""
+        row = self.db.execute(
+            "SELECT a.body FROM artifacts a WHERE a.id = ? AND a.kind = ?"
+            " AND EXISTS (SELECT 1 FROM artifact_links l WHERE l.artifact_id = a.id AND l.user_key = ?)",
+            (artifact_id, TRANSCRIPT, user_key),
+        ).fetchone()
+        return row["body"] if row is not None else None
+
+    def list(
+        self,
+        user_key: str,
+        kind: Optional[str] = None,
+        session_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        limit: int = 20,
+    ) -> list[dict]:
+        """
+        Newest-first summaries (no bodies) of `user_key`'s artifacts matching every
+        given filter, one per matching link: the session, parent and meta are the link's.
+        """
+        clauses, params = ["l.user_key = ?"], [user_key]
+        for column, value in (("kind", kind), ("session_id", session_id), ("parent_id", parent_id)):
+            if value is not None:
+                clauses.append(f"l.{column} = ?")
+                params.append(value)
+        rows = self.db.execute(
+            f"SELECT {SUMMARY_COLUMNS} FROM artifact_links l JOIN artifacts a ON a.id = l.artifact_id"
+            f" WHERE {' AND '.join(clauses)} ORDER BY l.created_at DESC LIMIT ?",
+            (*params, max(1, min(limit, ARTIFACT_LIST_LIMIT))),
+        ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    @staticmethod
+    def _link(row: sqlite3.Row) -> dict:
+        return {
+            "userKey": row["user_key"],
+            "sessionId": row["session_id"],
+            "parentId": row["parent_id"],
+            "meta": json.loads(row["meta"]),
+            "createdAt": row["created_at"],
+        }
+
+    @classmethod
+    def _summary(cls, row: sqlite3.Row) -> dict:
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "contentHash": row["content_hash"],
+            **cls._link(row),
+            "size": row["size"],
+        }
+
+
+artifact_store = ArtifactStore()
@@ -0,0 +1,185 @@
+"""
+Microbenchmarks for the pure-Python code that runs on every request.
+
+Usage (from backend/):
+    python benchmarks/bench_hot_paths.py                     # compare against baseline.json
+    python benchmarks/bench_hot_paths.py --update-baseline   # record a new baseline
+    python benchmarks/bench_hot_paths.py --only transcript   # run a subset
+
+Each case reports the median per-call latency over several timed repeats and the
+peak traced memory of one call. The run exits non-zero if any case regresses
+beyond the tolerances (relative to the checked-in baseline).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+from typing import Callable
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import agent_config  # noqa: E402
+import linkedin_writer  # noqa: E402
+from transcript_processor import process_transcript  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Relative regressions allowed before the gate fails. Latency is noisier than
+# memory, and tiny cases get an absolute slack so timer jitter can't fail them.
+TIME_TOLERANCE = 0.50
+MEMORY_TOLERANCE = 0.10
+TIME_SLACK_US = 2.0
+MEMORY_SLACK_BYTES = 1024
+
+
+# --- fixtures ---
+
+def _agent_inputs() -> dict:
+    return {
+        "topic_title": "AI automation for small businesses",
+        "global_context": "Small businesses are adopting AI agents for back-office work. " * 25,
+        "why_this_matters": "Costs of LLM inference dropped 10x in 18 months.",
+        "key_questions": [f"Question {i}: what changed in your workflow after automating step {i}?" for i in range(6)],
+        "user_name": "Sarah Chen",
+    }
+
+
+def _agent_state() -> dict:
+    return agent_config._initial_state(**_agent_inputs())
+
+
+def _messages(n: int) -> list[dict]:
+    return [
+        {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"Message {i}: we cut onboarding from 4 hours to 45 minutes by scripting the CRM import.",
+        }
+        for i in range(n)
+    ]
+
+
+TRANSCRIPT = "\n\n".join(
+    f"Sarah Chen: Story {i} — we quoted $8K, they said yes, and it changed how we price." for i in range(40)
+)
+
+
+# --- cases ---
+
+def _cases() -> dict[str, Callable[[], object]]:
+    inputs = _agent_inputs()
+    state = _agent_state()
+
+    def agent_fast_miss():
+        agent_config._config_cache.clear()
+        return agent_config.build_agent_config_fast(**inputs)
+
+    cases = {
+        "agent.construct_research_outline": lambda: agent_config.construct_research_outline(state),
+        "agent.build_prompt": lambda: agent_config.build_prompt(state),
+        "agent.build_agent_config_fast.miss": agent_fast_miss,
+        "agent.build_agent_config_fast.hit": lambda: agent_config.build_agent_config_fast(**inputs),
+        "agent.build_agent_config_graph": lambda: agent_config.build_agent_config_graph(**inputs),
+        "linkedin.get_random_template": lambda: linkedin_writer.get_random_template("personal-story"),
+        "linkedin.build_linkedin_messages": lambda: linkedin_writer.build_linkedin_messages(
+            "Pricing AI work", "Sarah Chen", TRANSCRIPT, content_type="career-challenge"
+        ),
+    }
+    for n in (10, 100, 1000, 10000):
+        messages = _messages(n)
+        cases[f"transcript.process_transcript.{n}"] = (
+            lambda m=messages: process_transcript("Pricing", "Sarah Chen", m, 1800)
+        )
+    return cases
+
+
+# --- measurement ---
+
+def measure(fn: Callable[[], object], repeats: int = 7, min_time: float = 0.05) -> dict:
+    fn()  # warm caches / imports
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    samples = [t / number for t in timer.repeat(repeat=repeats, number=number)]
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_us": round(statistics.median(samples) * 1e6, 3),
+        "peak_bytes": peak,
+    }
+
+
+def compare(name: str, result: dict, baseline: dict, time_tol: float, mem_tol: float) -> list[str]:
+    problems = []
+    base = baseline.get(name)
+    if base is None:
+        return problems
+    time_limit = base["median_us"] * (1 + time_tol) + TIME_SLACK_US
+    if result["median_us"] > time_limit:
+        problems.append(
+            f"{name}: latency {result['median_us']:.1f} µs > {time_limit:.1f} µs "
+            f"(baseline {base['median_us']:.1f} µs, +{time_tol:.0%})"
+        )
+    mem_limit = base["peak_bytes"] * (1 + mem_tol) + MEMORY_SLACK_BYTES
+    if result["peak_bytes"] > mem_limit:
+        problems.append(
+            f"{name}: peak memory {result['peak_bytes']} B > {int(mem_limit)} B "
+            f"(baseline {base['peak_bytes']} B, +{mem_tol:.0%})"
+        )
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update-baseline", action="store_true", help="write results to baseline.json")
+    parser.add_argument("--only", default="", help="run only cases whose name contains this string")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f).get("cases", {})
+
+    results, problems = {}, []
+    for name, fn in _cases().items():
+        if args.only and args.only not in name:
+            continue
+        result = measure(fn)
+        results[name] = result
+        base = baseline.get(name)
+        delta = f"{(result['median_us'] / base['median_us'] - 1):+.0%}" if base else "new"
+        print(f"{name:45s} {result['median_us']:12.1f} µs  {result['peak_bytes']:>10d} B  {delta:>6s}")
+        problems += compare(name, result, baseline, args.time_tolerance, args.memory_tolerance)
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(
+                # Merge so that `--only` refreshes just the selected cases
+                {"python": platform.python_version(), "machine": platform.machine(), "cases": {**baseline, **results}},
+                f, indent=2, sort_keys=True,
+            )
+            f.write("\n")
+        print(f"\nBaseline written to {BASELINE_PATH}")
+        return 0
+
+    if problems:
+        print("\nREGRESSIONS:")
+        for p in problems:
+            print(f"  {p}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
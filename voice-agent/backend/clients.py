@@ -0,0 +1,106 @@
+"""
+Shared upstream clients — one pooled instance per process.
+
+Created in the FastAPI lifespan (see `main.py`) so every request reuses the same
+keep-alive connections instead of paying a fresh TLS handshake per call.
+"""
+import asyncio
+import os
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Connection pool tuning for OpenAI. Generations are long-lived (10–30 s), so the
+# pool must be large enough to hold many in-flight completions per worker.
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "200"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "50"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "60"))
+
+# Perplexity research calls run 10–60 s; keep connections alive between them.
+PERPLEXITY_MAX_CONNECTIONS = int(os.getenv("PERPLEXITY_MAX_CONNECTIONS", "100"))
+PERPLEXITY_MAX_KEEPALIVE = int(os.getenv("PERPLEXITY_MAX_KEEPALIVE", "20"))
+PERPLEXITY_CONNECT_TIMEOUT = float(os.getenv("PERPLEXITY_CONNECT_TIMEOUT", "5"))
+PERPLEXITY_READ_TIMEOUT = float(os.getenv("PERPLEXITY_READ_TIMEOUT", "60"))
+PERPLEXITY_WARM_CONNECTIONS = int(os.getenv("PERPLEXITY_WARM_CONNECTIONS", "2"))
+PERPLEXITY_BASE_URL = os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
+
+_openai_client: Optional["AsyncOpenAI"] = None
+_perplexity_client: Optional[httpx.AsyncClient] = None
+
+
+def get_openai_client() -> "AsyncOpenAI":
+    """Return the process-wide AsyncOpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        # Imported here: the SDK takes ~0.5 s to import and not every process needs it
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        )
+        _openai_client = AsyncOpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY", ""),
+            http_client=http_client,
+            # Retries are handled by the upstream layer (upstream.py) within a deadline
+            max_retries=0,
+        )
+    return _openai_client
+
+
+def get_perplexity_client() -> httpx.AsyncClient:
+    """Return the process-wide httpx client used for Perplexity, creating it on first use."""
+    global _perplexity_client
+    if _perplexity_client is None:
+        _perplexity_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=PERPLEXITY_MAX_CONNECTIONS,
+                max_keepalive_connections=PERPLEXITY_MAX_KEEPALIVE,
+                keepalive_expiry=120,
+            ),
+            timeout=httpx.Timeout(PERPLEXITY_READ_TIMEOUT, connect=PERPLEXITY_CONNECT_TIMEOUT),
+        )
+    return _perplexity_client
+
+
+async def warm_perplexity_connections() -> None:
+    """
+    Open a few keep-alive connections ahead of the first research call so it
+    doesn't pay DNS + TLS setup. Failures are ignored — this is best effort.
+    """
+    client = get_perplexity_client()
+
+    async def _touch():
+        try:
+            await client.head(PERPLEXITY_BASE_URL, timeout=PERPLEXITY_CONNECT_TIMEOUT)
+        except httpx.HTTPError as e:
+            print(f"Perplexity warm-up skipped: {e}")
+
+    await asyncio.gather(*[_touch() for _ in range(PERPLEXITY_WARM_CONNECTIONS)])
+
+
+async def startup() -> None:
+    """Open shared clients. Called once from the app lifespan."""
+    # The OpenAI client (and SDK import) is left to first use or the optional
+    # warm-up (startup.py), so it doesn't delay the port opening.
+    get_perplexity_client()
+    if os.environ.get("PERPLEXITY_API_KEY") and PERPLEXITY_WARM_CONNECTIONS > 0:
+        await warm_perplexity_connections()
+
+
+async def shutdown() -> None:
+    """Close shared clients and release pooled connections."""
+    global _openai_client, _perplexity_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+    if _perplexity_client is not None:
+        await _perplexity_client.aclose()
+        _perplexity_client = None
@@ -0,0 +1,96 @@
+"""
+Speculative LinkedIn drafts for live sessions.
+
+For sessions opened with `speculativeDraft: true`, a draft post is generated in
+the background once enough user turns have accumulated, so it is ready (or
+nearly ready) when the interview ends. A draft is refreshed only when the user
+has said substantially more since the last one, and never more than
+SPECULATIVE_MAX_DRAFTS times per session, which bounds the extra cost.
+"""
+import asyncio
+import os
+from typing import Optional
+
+import admission
+from linkedin_writer import agenerate_linkedin_post
+from session_store import TranscriptSession
+
+SPECULATIVE_MIN_USER_TURNS = int(os.getenv("SPECULATIVE_MIN_USER_TURNS", "6"))
+SPECULATIVE_MAX_DRAFTS = int(os.getenv("SPECULATIVE_MAX_DRAFTS", "2"))
+# Refresh when the user's spoken content has grown by at least this fraction...
+SPECULATIVE_REFRESH_GROWTH = float(os.getenv("SPECULATIVE_REFRESH_GROWTH", "0.5"))
+# ...and by at least this many user turns since the last draft
+SPECULATIVE_REFRESH_MIN_TURNS = int(os.getenv("SPECULATIVE_REFRESH_MIN_TURNS", "3"))
+
+
+def should_draft(session: TranscriptSession) -> bool:
+    """Decide whether the session warrants a new speculative draft right now."""
+    if not session.speculative or session.finalized:
+        return False
+    if session.draft_task is not None and not session.draft_task.done():
+        return False
+    if session.drafts_started >= SPECULATIVE_MAX_DRAFTS:
+        return False
+    if session.user_turns < SPECULATIVE_MIN_USER_TURNS:
+        return False
+    if session.drafts_started == 0:
+        return True
+
+    new_turns = session.user_turns - session.draft_user_turns
+    growth = (session.user_chars - session.draft_user_chars) / max(session.draft_user_chars, 1)
+    return new_turns >= SPECULATIVE_REFRESH_MIN_TURNS and growth >= SPECULATIVE_REFRESH_GROWTH
+
+
+async def _generate_draft(session: TranscriptSession, message_count: int) -> None:
+    try:
+        # Drafts count against the user's budget and the OpenAI slots like any other post
+        async with admission.admit("openai", session.user_key):
+            result = await agenerate_linkedin_post(
+                topic=session.topic,
+                user_name=session.user_name,
+                transcript=session.transcript_text(),
+            )
+        result["basedOnMessages"] = message_count
+        session.draft = result
+    except Exception as e:
+        # A failed speculative draft is not an error for the user; generation
+        # will simply happen on demand after the session ends.
+        print(f"Speculative draft failed for session {session.id}: {e}")
+
+
+def maybe_start_draft(session: TranscriptSession) -> bool:
+    """Start a background draft if the session qualifies. Returns True if one was started."""
+    if not should_draft(session):
+        return False
+    session.drafts_started += 1
+    session.draft_user_turns = session.user_turns
+    session.draft_user_chars = session.user_chars
+    session.draft_task = asyncio.create_task(_generate_draft(session, session.message_count))
+    return True
+
+
+def draft_status(session: TranscriptSession) -> dict:
+    """Describe the session's speculative draft for API responses."""
+    pending = session.draft_task is not None and not session.draft_task.done()
+    if session.draft is None:
+        status = "pending" if pending else "none"
+    else:
+        status = "refreshing" if pending else "ready"
+    return {
+        "status": status,
+        "draft": session.draft,
+        "stale": session.draft is not None and session.draft["basedOnMessages"] < session.message_count,
+        "draftsStarted": session.drafts_started,
+        "maxDrafts": SPECULATIVE_MAX_DRAFTS,
+    }
+
+
+async def wait_for_draft(session: TranscriptSession, timeout: Optional[float]) -> dict:
+    """Wait up to `timeout` seconds for an in-flight draft, then report its status."""
+    task = session.draft_task
+    if task is not None and not task.done() and timeout:
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            pass
+    return draft_status(session)
@@ -0,0 +1,355 @@
+"""
+Async jobs — long generations without holding an HTTP connection open.
+
+POST /jobs/<kind> stores a job in SQLite and returns its id straight away; a
+bounded pool of local workers (JOB_WORKERS) runs it and writes the result back.
+Clients poll GET /jobs/{id}, long-poll with ?wait=, or subscribe to
+GET /jobs/{id}/events. An Idempotency-Key makes a retried submission return the
+existing job instead of starting the upstream work again; keys are scoped to the
+submitting user, so two users can't collide on (or read) each other's jobs.
+
+Jobs survive a restart: queued jobs are re-enqueued on startup, and jobs stuck
+in "running" for longer than JOB_RUNNING_TIMEOUT are retried.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+import admission
+from admission import AdmissionRejected
+from storage import DATA_DIR, open_sqlite
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "256"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "86400"))  # finished jobs are kept a day
+JOB_RUNNING_TIMEOUT = float(os.getenv("JOB_RUNNING_TIMEOUT", "600"))
+JOB_POLL_INTERVAL = 1.0  # long-poll falls back to the DB (other worker processes) this often
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    user_key TEXT NOT NULL,
+    idempotency_key TEXT,
+    request_hash TEXT NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_user_idempotency ON jobs (user_key, idempotency_key);
+"""
+
+Handler = Callable[[dict, str], Awaitable[dict]]
+
+
+class IdempotencyConflict(Exception):
+    """An Idempotency-Key was reused with a different request body."""
+
+
+class JobQueueFull(AdmissionRejected):
+    def __init__(self):
+        super().__init__("job_queue_full", 5)
+
+
+class JobStore:
+    """Thin SQLite persistence for jobs (WAL, one connection per process)."""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+
+    def open(self) -> None:
+        if self._db is None:
+            self._db = open_sqlite(self.path, SCHEMA)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        self.open()
+        return self._db
+
+    @staticmethod
+    def _serialize(kind: str, request: dict) -> tuple[str, str]:
+        body = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return body, hashlib.sha256(f"{kind}\n{body}".encode("utf-8")).hexdigest()
+
+    def find(self, kind: str, request: dict, user_key: str, idempotency_key: Optional[str]) -> Optional[dict]:
+        """The job `user_key` already submitted under `idempotency_key`, if any. Raises IdempotencyConflict on a different body."""
+        if not idempotency_key:
+            return None
+        existing = self.db.execute(
+            "SELECT * FROM jobs WHERE user_key = ? AND idempotency_key = ?", (user_key, idempotency_key)
+        ).fetchone()
+        if existing is None:
+            return None
+        if existing["request_hash"] != self._serialize(kind, request)[1]:
+            raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+        return self._to_dict(existing)
+
+    def create(self, kind: str, request: dict, user_key: str, idempotency_key: Optional[str] = None) -> tuple[dict, bool]:
+        """Insert a queued job. Returns (job, created); the user's existing job for the same idempotency key is reused."""
+        existing = self.find(kind, request, user_key, idempotency_key)
+        if existing is not None:
+            return existing, False
+
+        body, request_hash = self._serialize(kind, request)
+        job_id = uuid.uuid4().hex
+        try:
+            self.db.execute(
+                "INSERT INTO jobs (id, kind, status, user_key, idempotency_key, request_hash, request, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, user_key, idempotency_key or None, request_hash, body, time.time()),
+            )
+        except sqlite3.IntegrityError:
+            # Lost a race with a concurrent submission of the same key
+            return self.create(kind, request, user_key, idempotency_key)
+        return self.get(job_id), True
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def claim(self, job_id: str) -> Optional[sqlite3.Row]:
+        """Mark a queued job running. Returns its row, or None if another worker got it first."""
+        cursor = self.db.execute(
+            "UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, time.time(), job_id, QUEUED),
+        )
+        if cursor.rowcount != 1:
+            return None
+        return self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def finish(self, job_id: str, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+        self.db.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (
+                FAILED if error is not None else SUCCEEDED,
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                error,
+                time.time(),
+                job_id,
+            ),
+        )
+
+    def requeue(self, job_id: str) -> None:
+        """Put a job interrupted by shutdown back in the queue for the next start."""
+        self.db.execute(
+            "UPDATE jobs SET status = ?, started_at = NULL WHERE id = ? AND status = ?",
+            (QUEUED, job_id, RUNNING),
+        )
+
+    def recover(self, limit: int = -1) -> list[str]:
+        """Requeue jobs abandoned by a dead worker and return up to `limit` (default all) queued job ids, oldest first."""
+        self.db.execute(
+            "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ? AND started_at < ?",
+            (QUEUED, RUNNING, time.time() - JOB_RUNNING_TIMEOUT),
+        )
+        rows = self.db.execute(
+            "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?", (QUEUED, limit)
+        ).fetchall()
+        return [row["id"] for row in rows]
+
+    def purge(self, ttl: float = JOB_TTL_SECONDS) -> int:
+        cursor = self.db.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (SUCCEEDED, FAILED, time.time() - ttl),
+        )
+        return cursor.rowcount
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        return {
+            "jobId": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "createdAt": row["created_at"],
+            "startedAt": row["started_at"],
+            "finishedAt": row["finished_at"],
+        }
+
+
+class JobRunner:
+    """Bounded pool of asyncio workers executing jobs from the store."""
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE):
+        self.store = store
+        self.concurrency = max(1, workers)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._handlers: dict[str, tuple[str, Handler]] = {}
+        self._workers: list[asyncio.Task] = []
+        self._done: dict[str, asyncio.Event] = {}  # job id -> event set on status change
+        self._busy = 0  # jobs being run right now
+        self._draining = False
+        self._backlog = False  # queued jobs in the store that didn't fit in the in-memory queue
+
+    def provider(self, kind: str) -> str:
+        return self._handlers[kind][0]
+
+    def register(self, kind: str, provider: str, handler: Handler) -> None:
+        """`handler(request, user_key) -> result dict` runs the job; it holds a `provider` admission slot meanwhile."""
+        self._handlers[kind] = (provider, handler)
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._draining = False
+        self.store.open()
+        purged = self.store.purge()
+        recovered = self._refill()
+        if purged or recovered:
+            more = " (more waiting in the store)" if self._backlog else ""
+            print(f"Job store: purged {purged} finished jobs, re-enqueued {recovered}{more}")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def drain(self) -> None:
+        """Stop starting new jobs; queued ones stay in the store for the next start."""
+        self._draining = True
+
+    async def stop(self, drain_timeout: float = 0.0) -> None:
+        """Stop the workers, giving running jobs up to `drain_timeout` seconds to finish first (the rest are requeued)."""
+        self.drain()
+        deadline = time.monotonic() + drain_timeout
+        if self._busy and drain_timeout > 0:
+            print(f"Job runner: draining {self._busy} running jobs (up to {drain_timeout:.0f}s)")
+        while self._busy and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self.store.close()
+
+    # --- public API ---
+
+    def submit(self, kind: str, request: dict, user_key: str, idempotency_key: Optional[str] = None) -> tuple[dict, bool]:
+        """
+        Store and enqueue a job; returns (job, created).
+
+        A resubmission under the same idempotency key returns the existing job
+        without charging the user again. Raises AdmissionRejected (user over
+        rate, JobQueueFull) or IdempotencyConflict.
+        """
+        if kind not in self._handlers:
+            raise KeyError(f"Unknown job kind '{kind}'")
+        existing = self.store.find(kind, request, user_key, idempotency_key)
+        if existing is not None:
+            return existing, False
+        admission.charge(self.provider(kind), user_key)
+        if self._queue.full():
+            raise JobQueueFull()
+        job, created = self.store.create(kind, request, user_key, idempotency_key)
+        if created:
+            self._queue.put_nowait(job["jobId"])
+        return job, created
+
+    async def wait(self, job_id: str, timeout: float, changed_from: Optional[str] = None) -> Optional[dict]:
+        """
+        Return the job once it is finished (or, with `changed_from`, once its status
+        differs from that) or `timeout` seconds have passed. None if the job is unknown.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.store.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in TERMINAL or remaining <= 0:
+                return job
+            if changed_from is not None and job["status"] != changed_from:
+                return job
+            event = self._done.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, JOB_POLL_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {"workers": len(self._workers), "running": self._busy, "queued": self._queue.qsize(), "draining": self._draining}
+
+    # --- internals ---
+
+    def _refill(self) -> int:
+        """Enqueue the oldest queued jobs from the store, as many as the queue holds."""
+        job_ids = self.store.recover(self._queue.maxsize - self._queue.qsize())
+        for job_id in job_ids:
+            self._queue.put_nowait(job_id)
+        self._backlog = bool(job_ids) and self._queue.full()
+        return len(job_ids)
+
+    async def _worker(self) -> None:
+        while True:
+            if self._backlog and self._queue.empty() and not self._draining:
+                self._refill()  # the overflow from start(); jobs already claimed are skipped by claim()
+            job_id = await self._queue.get()
+            if self._draining:
+                continue  # still queued in the store
+            try:
+                row = self.store.claim(job_id)
+                if row is not None:
+                    self._notify(job_id)
+                    self._busy += 1
+                    try:
+                        await self._run(row)
+                    finally:
+                        self._busy -= 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker error for {job_id}: {e}")
+            finally:
+                self._notify(job_id)
+
+    def _notify(self, job_id: str) -> None:
+        """Wake local waiters so they re-read the job."""
+        event = self._done.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _run(self, row: sqlite3.Row) -> None:
+        provider, handler = self._handlers[row["kind"]]
+        request = json.loads(row["request"])
+        try:
+            # The user's rate was charged at submission; here we only wait for a provider slot
+            while True:
+                try:
+                    ticket = await admission.acquire(provider, row["user_key"], charge=False)
+                    break
+                except AdmissionRejected as e:
+                    await asyncio.sleep(e.retry_after)
+            try:
+                result = await handler(request, row["user_key"])
+            finally:
+                if ticket is not None:
+                    ticket.release()
+        except asyncio.CancelledError:
+            self.store.requeue(row["id"])
+            raise
+        except Exception as e:
+            print(f"Job {row['id']} ({row['kind']}) failed: {e}")
+            self.store.finish(row["id"], error=str(e) or type(e).__name__)
+            return
+        self.store.finish(row["id"], result=result)
+
+
+job_store = JobStore()
+job_runner = JobRunner(job_store)
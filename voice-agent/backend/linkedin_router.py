@@ -0,0 +1,65 @@
+"""
+Model routing for LinkedIn generation.
+
+Picks the model and token limit from the transcript size, content type and the
+request's latency tier:
+
+    quality   -> LINKEDIN_QUALITY_MODEL, never escalates
+    fast      -> LINKEDIN_FAST_MODEL, never escalates (latency over polish)
+    balanced  -> fast model for short transcripts of a fast-eligible content type,
+                 escalating to the quality model only if `check_post` finds problems;
+                 everything else goes straight to the quality model
+
+The route taken is reported back to the caller.
+"""
+import os
+from typing import Optional
+
+LATENCY_TIERS = ("fast", "balanced", "quality")
+LINKEDIN_DEFAULT_TIER = os.getenv("LINKEDIN_DEFAULT_TIER", "balanced")
+
+LINKEDIN_FAST_MODEL = os.getenv("LINKEDIN_FAST_MODEL", "gpt-4o-mini")
+LINKEDIN_QUALITY_MODEL = os.getenv("LINKEDIN_QUALITY_MODEL", "gpt-4o")
+# Transcripts up to this many (estimated) tokens count as short
+LINKEDIN_SHORT_TRANSCRIPT_TOKENS = int(os.getenv("LINKEDIN_SHORT_TRANSCRIPT_TOKENS", "1500"))
+LINKEDIN_FAST_CONTENT_TYPES = {
+    t.strip() for t in os.getenv("LINKEDIN_FAST_CONTENT_TYPES", "personal-story,career-challenge").split(",") if t.strip()
+}
+LINKEDIN_FAST_MAX_TOKENS = int(os.getenv("LINKEDIN_FAST_MAX_TOKENS", "700"))
+LINKEDIN_MAX_TOKENS = int(os.getenv("LINKEDIN_MAX_TOKENS", "1000"))
+
+# Quality check thresholds
+LINKEDIN_MIN_POST_CHARS = int(os.getenv("LINKEDIN_MIN_POST_CHARS", "400"))
+LINKEDIN_MAX_POST_CHARS = 3000  # LinkedIn's post limit
+MIN_PARAGRAPHS = 3
+REFUSAL_MARKERS = ("i'm sorry", "i am sorry", "as an ai", "i can't help", "i cannot help")
+
+
+def choose_route(transcript_tokens: int, content_type: str, tier: Optional[str] = None) -> dict:
+    """Return {"name", "tier", "model", "maxTokens", "escalateTo"} for a generation."""
+    tier = tier or LINKEDIN_DEFAULT_TIER
+    if tier not in LATENCY_TIERS:
+        raise ValueError(f"Unknown latency tier '{tier}' (expected one of {', '.join(LATENCY_TIERS)})")
+
+    if tier == "fast":
+        return {"name": "fast", "tier": tier, "model": LINKEDIN_FAST_MODEL, "maxTokens": LINKEDIN_FAST_MAX_TOKENS, "escalateTo": None}
+    short = transcript_tokens <= LINKEDIN_SHORT_TRANSCRIPT_TOKENS
+    if tier == "balanced" and short and content_type in LINKEDIN_FAST_CONTENT_TYPES:
+        return {"name": "fast", "tier": tier, "model": LINKEDIN_FAST_MODEL, "maxTokens": LINKEDIN_FAST_MAX_TOKENS, "escalateTo": LINKEDIN_QUALITY_MODEL}
+    return {"name": "quality", "tier": tier, "model": LINKEDIN_QUALITY_MODEL, "maxTokens": LINKEDIN_MAX_TOKENS, "escalateTo": None}
+
+
+def check_post(text: str, finish_reason: Optional[str] = None) -> list[str]:
+    """Cheap local checks on a generated post. Returns the problems found (empty list = pass)."""
+    issues = []
+    if finish_reason == "length":
+        issues.append("truncated")
+    if len(text) < LINKEDIN_MIN_POST_CHARS:
+        issues.append("too_short")
+    elif len(text) > LINKEDIN_MAX_POST_CHARS:
+        issues.append("too_long")
+    if len([block for block in text.split("\n\n") if block.strip()]) < MIN_PARAGRAPHS:
+        issues.append("no_paragraphs")
+    if any(marker in text[:200].lower() for marker in REFUSAL_MARKERS):
+        issues.append("refusal")
+    return issues
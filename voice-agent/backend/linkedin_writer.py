@@ -1,22 +1,69 @@
+import asyncio
 import os
 import random
-from openai import OpenAI
-from typing import Optional
+from typing import AsyncContextManager, AsyncIterator, Callable, Optional, Tuple
+
+from clients import get_openai_client
+from transcript_condenser import condense_transcript
+from token_utils import usage_to_dict
+from linkedin_router import LINKEDIN_MAX_TOKENS, check_post, choose_route
+from metrics import LINKEDIN_ROUTES, record_token_usage, track_upstream
+from upstream import call_upstream
+
+# --- PROMPT LAYOUT ---
+# The prompt is split so that providers can cache it:
+#   system message = SHARED_PREFIX  (ghostwriter role + base rules + every template)
+#   user message   = per-request suffix (writer, voice, topic, chosen template, transcript)
+# SHARED_PREFIX contains nothing request-specific, so it is byte-identical across
+# calls and long enough (>1024 tokens) to hit OpenAI's automatic prompt cache.
+
+# BASE RULES (Ported from contentService.js with Podcast Context injected)
+BASE_RULES = """
+YOU ARE: A LinkedIn ghostwriter writing for the speaker named in the request.
 
-def get_random_template(content_type: str, topic: str, base_rules: str) -> str:
-    """Selects a random structural template based on content type."""
-    rand = random.random()
-    
-    # PERSONAL STORY - 4 VARIATIONS
-    if content_type == 'personal-story':
-        if rand < 0.25:
-            return f"""{base_rules}
+SOURCE MATERIAL:
+You are writing based on the provided PODCAST TRANSCRIPT.
+- Do NOT invent stories.
+- Extract the specific story, insight, or lesson from the transcript that fits the selected template.
+- Use the guest's/speaker's actual words and phrasing where possible for authenticity.
 
-TEMPLATE: Linear Personal Story (Action-First)
+WRITING VOICE: As given in the request.
+TRANSCRIPT CONTEXT: The speaker is the person named in the request (or the guest). Write from their perspective ("I").
 
-Write about: "{topic}" (Based on the Transcript)
+PROFESSIONAL PERSONAL VOICE:
+✓ Use "I/me/my" naturally
+✓ Share specific details from the transcript (numbers, tools, specific moments)
+✓ Sound polished but conversational (like advising a colleague)
+✓ Show authentic experience, not generic advice
+
+CRITICAL - OPENING LINE VARIETY:
+❌ DO NOT start with "[Time period] ago, I..." unless essential
+❌ DO NOT force timeframes into every opening
+✓ Vary openings:
+  - Start with action: "I quoted $8K..."
+  - Start with realization: "My manager called me out..."
+  - Start with contrast: "Used to X, now I Y"
+  - Start with pattern: "Every time I do X..."
+  - Start with NO timeframe
+
+❌ AVOID:
+- Corporate buzzwords: "leveraged", "synergized", "optimized"
+- Repetitive patterns: "Last month/week/year, I..."
+- Guru speak: "Here's what nobody tells you"
+- Generic advice: "Always do X"
 
-STRUCTURE:
+FORMATTING:
+- Short lines (10-20 words max)
+- Blank line after every 2-3 sentences
+- Natural paragraph flow
+- End with: "Found this valuable? Feel free to repost ♻️" (unless template says otherwise)
+"""
+
+# STRUCTURAL TEMPLATES — content_type -> [(template_id, title, body)]
+# 'career-challenge' is mapped to 'Professional Insight' for the podcast.
+TEMPLATES: dict[str, list[Tuple[str, str, str]]] = {
+    'personal-story': [
+        ("linear-story", "Linear Personal Story (Action-First)", """STRUCTURE:
 Strong action statement (NO timeframe - dive right in)
 
 What was happening (context from transcript)
@@ -35,18 +82,8 @@ Everyone knew what they did...
 Built a simple bot...
 Result: Team saves 2.5 hours weekly...
 Sometimes the best tools solve memory problems...
-What's one process you automated?"
-
-WRITE THE POST NOW in this style used the transcripts:"""
-
-        elif rand < 0.5:
-            return f"""{base_rules}
-
-TEMPLATE: Reverse Reveal Story
-
-Write about: "{topic}" (Based on the Transcript)
-
-STRUCTURE:
+What's one process you automated?\""""),
+        ("reverse-reveal", "Reverse Reveal Story", """STRUCTURE:
 Bold outcome statement (what happened/result - NO timeframe)
 
 Wait, how? (create curiosity)
@@ -65,18 +102,8 @@ Why? Spreadsheet said $8K.
 But I realized...
 Quoted $15K. They said yes.
 Clients price by risk, not effort.
-What's a project you underpriced?"
-
-WRITE THE POST NOW in this style using the transcript:"""
-
-        elif rand < 0.75:
-            return f"""{base_rules}
-
-TEMPLATE: Before/After Contrast
-
-Write about: "{topic}" (Based on the Transcript)
-
-STRUCTURE:
+What's a project you underpriced?\""""),
+        ("before-after", "Before/After Contrast", """STRUCTURE:
 Used to [old behavior mentioned in transcript]
 Now [new behavior/insight]
 
@@ -97,18 +124,8 @@ The shift: Automation.
 Before: Manual, exhausting.
 After: Automatic, personalized.
 Best automation handles data, not relationships.
-What manual task are you doing?"
-
-WRITE THE POST NOW in this style using the transcript:"""
-
-        else:
-            return f"""{base_rules}
-
-TEMPLATE: Vulnerable/Honest Confession
-
-Write about: "{topic}" (Based on the Transcript)
-
-STRUCTURE:
+What manual task are you doing?\""""),
+        ("honest-confession", "Vulnerable/Honest Confession", """STRUCTURE:
 Honest confession or mistake (from transcript - NO timeframe)
 
 Why this mattered (stakes/emotion)
@@ -127,20 +144,10 @@ Felt relief, not excitement.
 Optimizing for comfort over growth.
 Next pitch: $12K. Uncomfortable.
 But discomfort is a compass.
-What are you undercharging for?"
-
-WRITE THE POST NOW in this style using the transcript:"""
-
-    # CAREER CHALLENGE - 4 VARIATIONS (Mapped to 'Professional Insight' for Podcast)
-    elif content_type == 'career-challenge':
-        if rand < 0.25:
-            return f"""{base_rules}
-
-TEMPLATE: Pattern Recognition (Insight)
-
-Write about: "{topic}" (Based on the Transcript)
-
-STRUCTURE:
+What are you undercharging for?\""""),
+    ],
+    'career-challenge': [
+        ("pattern-recognition", "Pattern Recognition (Insight)", """STRUCTURE:
 I kept noticing [pattern from transcript] (NO specific timeframe)
 
 Every time [trigger], [result] happened
@@ -151,18 +158,8 @@ How to approach it (solution)
 
 What's still a work in progress
 
-Question for others
-
-WRITE THE POST NOW in this style using the transcript:"""
-
-        elif rand < 0.5:
-            return f"""{base_rules}
-
-TEMPLATE: Moment of Clarity
-
-Write about: "{topic}" (Based on the Transcript)
-
-STRUCTURE:
+Question for others"""),
+        ("moment-of-clarity", "Moment of Clarity", """STRUCTURE:
 Specific moment that changed perspective (from transcript)
 
 Here's what happened (scene setting)
@@ -173,18 +170,8 @@ Why it wasn't obvious before
 
 What is done differently now
 
-Invitation for others to share
-
-WRITE THE POST NOW in this style using the transcript:"""
-
-        elif rand < 0.75:
-            return f"""{base_rules}
-
-TEMPLATE: Problem-Agitate-Solve
-
-Write about: "{topic}" (Based on the Transcript)
-
-STRUCTURE:
+Invitation for others to share"""),
+        ("problem-agitate-solve", "Problem-Agitate-Solve", """STRUCTURE:
 The problem (clear, relatable - NO timeframe)
 
 Why it got worse (agitate the pain from transcript)
@@ -195,18 +182,8 @@ What finally worked (specific solution)
 
 Current state (honest results)
 
-Question for others
-
-WRITE THE POST NOW in this style using the transcript:"""
-
-        else:
-            return f"""{base_rules}
-
-TEMPLATE: Contrarian Take
-
-Write about: "{topic}" (Based on the Transcript)
-
-STRUCTURE:
+Question for others"""),
+        ("contrarian-take", "Contrarian Take", """STRUCTURE:
 Unpopular opinion about [topic]
 
 Why conventional wisdom says opposite
@@ -217,87 +194,289 @@ Why this approach works
 
 When it might NOT work (nuance)
 
-Open question for debate
+Open question for debate"""),
+    ],
+}
 
-WRITE THE POST NOW in this style using the transcript:"""
-            
-    # DEFAULT / FALLBACK
-    else:
-        return f"""{base_rules}
-
-Write a professional personal LinkedIn post about: "{topic}" based on the transcript.
+# DEFAULT / FALLBACK — used for unknown content types
+GENERAL_TEMPLATE = ("general", "General Professional Post", """Write a professional personal LinkedIn post about the topic based on the transcript.
 
 Keep it authentic, specific, and use the voice guidelines above.
 
-REMEMBER: Vary your opening line. Don't start with a timeframe unless it's truly essential."""
+REMEMBER: Vary your opening line. Don't start with a timeframe unless it's truly essential.""")
 
 
-def generate_linkedin_post(topic: str, user_name: str, transcript: str, writing_style: str = "authentic, professional", content_type: Optional[str] = None) -> str:
-    """
-    Generate a viral LinkedIn post from podcast transcript using dynamic 'Nick Sarra' style templates.
-    """
-    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""))
+def _render_template_library() -> str:
+    sections = []
+    for content_type, variants in TEMPLATES.items():
+        for template_id, title, body in variants:
+            sections.append(f"### TEMPLATE [{template_id}] ({content_type}): {title}\n\n{body}")
+    template_id, title, body = GENERAL_TEMPLATE
+    sections.append(f"### TEMPLATE [{template_id}]: {title}\n\n{body}")
+    return "\n\n".join(sections)
 
-    # If content_type is not provided, randomly select one to ensure variety
-    if not content_type:
-        content_type = random.choice(['personal-story', 'career-challenge'])
 
-    # BASE RULES (Ported from contentService.js with Podcast Context injected)
-    base_rules = f"""
-YOU ARE: A LinkedIn ghostwriter writing for {user_name}.
+LINKEDIN_MODEL = "gpt-4o"  # Or 'gpt-4-turbo'
+# Served while LINKEDIN_MODEL's circuit is open or it keeps failing; empty = fail fast
+LINKEDIN_FALLBACK_MODEL = os.getenv("LINKEDIN_FALLBACK_MODEL", "gpt-4o-mini")
+LINKEDIN_MODELS = [LINKEDIN_MODEL] + [m for m in (LINKEDIN_FALLBACK_MODEL,) if m and m != LINKEDIN_MODEL]
+LINKEDIN_SYSTEM_MESSAGE = "You are a world-class LinkedIn ghostwriter."
 
-SOURCE MATERIAL:
-You are writing based on the provided PODCAST TRANSCRIPT.
-- Do NOT invent stories.
-- Extract the specific story, insight, or lesson from the transcript that fits the selected template.
-- Use the guest's/speaker's actual words and phrasing where possible for authenticity.
+# Byte-stable prefix shared by every request. Never interpolate request data here.
+SHARED_PREFIX = (
+    f"{LINKEDIN_SYSTEM_MESSAGE}\n"
+    f"{BASE_RULES}\n"
+    f"TEMPLATE LIBRARY — the request names exactly one template to follow.\n\n"
+    f"{_render_template_library()}"
+)
 
-WRITING VOICE: {writing_style}
-TRANSCRIPT CONTEXT: The speaker is {user_name} (or the guest). Write from their perspective ("I").
 
-PROFESSIONAL PERSONAL VOICE:
-✓ Use "I/me/my" naturally
-✓ Share specific details from the transcript (numbers, tools, specific moments)
-✓ Sound polished but conversational (like advising a colleague)
-✓ Show authentic experience, not generic advice
+def get_random_template(content_type: str) -> Tuple[str, str, str]:
+    """Selects a random structural template (id, title, body) based on content type."""
+    variants = TEMPLATES.get(content_type)
+    if not variants:
+        return GENERAL_TEMPLATE
+    return random.choice(variants)
 
-CRITICAL - OPENING LINE VARIETY:
-❌ DO NOT start with "[Time period] ago, I..." unless essential
-❌ DO NOT force timeframes into every opening
-✓ Vary openings:
-  - Start with action: "I quoted $8K..."
-  - Start with realization: "My manager called me out..."
-  - Start with contrast: "Used to X, now I Y"
-  - Start with pattern: "Every time I do X..."
-  - Start with NO timeframe
 
-❌ AVOID:
-- Corporate buzzwords: "leveraged", "synergized", "optimized"
-- Repetitive patterns: "Last month/week/year, I..."
-- Guru speak: "Here's what nobody tells you"
-- Generic advice: "Always do X"
+def find_template(content_type: str, template_id: str) -> Tuple[str, str, str]:
+    """Look up a template by id within a content type. Raises KeyError if unknown."""
+    for template in TEMPLATES.get(content_type, []):
+        if template[0] == template_id:
+            return template
+    if template_id == GENERAL_TEMPLATE[0]:
+        return GENERAL_TEMPLATE
+    raise KeyError(f"Unknown template '{template_id}' for content type '{content_type}'")
 
-FORMATTING:
-- Short lines (10-20 words max)
-- Blank line after every 2-3 sentences
-- Natural paragraph flow
-- End with: "Found this valuable? Feel free to repost ♻️" (unless template says otherwise)
+
+def build_request_suffix(topic: str, user_name: str, transcript: str, writing_style: str, template: Tuple[str, str, str]) -> str:
+    """Per-request part of the prompt: everything that varies between calls, after the shared prefix."""
+    template_id, title, _ = template
+    return f"""WRITER: {user_name}
+WRITING VOICE: {writing_style}
+TEMPLATE: [{template_id}] {title}
+
+Write about: "{topic}" (Based on the Transcript)
 
 TRANSCRIPT:
 {transcript}
-"""
 
-    # Select the specific template structure
-    final_prompt = get_random_template(content_type, topic, base_rules)
-
-    completion = client.chat.completions.create(
-        model="gpt-4o",  # Or 'gpt-4-turbo'
-        messages=[
-            {"role": "system", "content": "You are a world-class LinkedIn ghostwriter."},
-            {"role": "user", "content": final_prompt}
-        ],
-        temperature=0.7, # Slightly lower temperature for consistency with transcript
-        max_tokens=1000
+WRITE THE POST NOW following TEMPLATE [{template_id}], in this style, using the transcript:"""
+
+
+def build_linkedin_messages(topic: str, user_name: str, transcript: str, writing_style: str = "authentic, professional", content_type: Optional[str] = None, template_id: Optional[str] = None) -> Tuple[list[dict], str, str]:
+    """
+    Assemble chat messages for a generation.
+    Returns (messages, content_type, template_id) so callers can report what was used.
+    """
+    # If content_type is not provided, randomly select one to ensure variety
+    if not content_type:
+        content_type = random.choice(['personal-story', 'career-challenge'])
+
+    if template_id:
+        template = find_template(content_type, template_id)
+    else:
+        template = get_random_template(content_type)
+
+    messages = [
+        {"role": "system", "content": SHARED_PREFIX},
+        {"role": "user", "content": build_request_suffix(topic, user_name, transcript, writing_style, template)},
+    ]
+    return messages, content_type, template[0]
+
+
+def _completion_kwargs(messages: list[dict], model: str = LINKEDIN_MODEL, max_tokens: int = LINKEDIN_MAX_TOKENS) -> dict:
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.7,  # Slightly lower temperature for consistency with transcript
+        "max_tokens": max_tokens,
+        # Routes requests sharing SHARED_PREFIX to the same cache shard
+        "extra_body": {"prompt_cache_key": "linkedin-writer-v1"},
+    }
+
+
+def _models_for(model: str) -> list[str]:
+    """`model` first, then the configured fallbacks for the upstream layer."""
+    return [model] + [m for m in LINKEDIN_MODELS if m != model]
+
+
+async def _complete_post(messages: list[dict], model: str, max_tokens: int):
+    client = get_openai_client()
+    model, completion = await call_upstream(
+        "openai",
+        "linkedin_post",
+        lambda model: client.chat.completions.create(**_completion_kwargs(messages, model, max_tokens)),
+        _models_for(model),
     )
+    usage = usage_to_dict(completion.usage)
+    record_token_usage("openai", model, usage)
+    choice = completion.choices[0]
+    return model, (choice.message.content or "").strip(), choice.finish_reason, usage
+
+
+async def agenerate_linkedin_post(topic: str, user_name: str, transcript: str, writing_style: str = "authentic, professional", content_type: Optional[str] = None, template_id: Optional[str] = None, latency_tier: Optional[str] = None) -> dict:
+    """
+    Generate a LinkedIn post from a podcast transcript using the dynamic 'Nick Sarra'
+    style templates, on the shared, pooled AsyncOpenAI client.
 
-    return (completion.choices[0].message.content or "").strip()
+    Long transcripts are condensed first (see transcript_condenser).
+
+    The model and token limit come from linkedin_router (transcript size, content
+    type, `latency_tier`). A fast-model draft that fails the local quality check is
+    regenerated once on the quality model. The completion runs through the upstream
+    layer (deadline, retries, circuit breaker); `model` is the model that wrote the post.
+
+    Returns {"linkedin", "contentType", "template", "model", "route", "usage", "transcript"}.
+    """
+    source, condensation = await condense_transcript(transcript)
+    messages, content_type, template_id = build_linkedin_messages(
+        topic, user_name, source, writing_style, content_type, template_id
+    )
+    route = choose_route(condensation["originalTokens"], content_type, latency_tier)
+
+    model, text, finish_reason, usage = await _complete_post(messages, route["model"], route["maxTokens"])
+    issues = check_post(text, finish_reason)
+    escalated = False
+    if issues and route["escalateTo"]:
+        print(f"Escalating LinkedIn post to {route['escalateTo']} after quality check: {', '.join(issues)}")
+        draft_usage = usage
+        model, text, finish_reason, usage = await _complete_post(messages, route["escalateTo"], LINKEDIN_MAX_TOKENS)
+        # Report what the request cost in total, rejected draft included
+        usage = {k: v + draft_usage.get(k, 0) for k, v in usage.items()}
+        issues = check_post(text, finish_reason)
+        escalated = True
+    LINKEDIN_ROUTES.inc(route["name"], model, str(escalated).lower())
+
+    return {
+        "linkedin": text,
+        "contentType": content_type,
+        "template": template_id,
+        "model": model,
+        "route": {
+            "name": route["name"],
+            "tier": route["tier"],
+            "transcriptTokens": condensation["originalTokens"],
+            "escalated": escalated,
+            "qualityIssues": issues,
+        },
+        "usage": usage,
+        "transcript": condensation,
+    }
+
+
+LINKEDIN_BATCH_CONCURRENCY = int(os.getenv("LINKEDIN_BATCH_CONCURRENCY", "4"))
+LINKEDIN_BATCH_MAX_VARIANTS = int(os.getenv("LINKEDIN_BATCH_MAX_VARIANTS", "8"))
+
+
+def all_template_choices() -> list[Tuple[str, str]]:
+    """Every (content_type, template_id) pair in the template library."""
+    return [
+        (content_type, template_id)
+        for content_type, variants in TEMPLATES.items()
+        for template_id, _, _ in variants
+    ]
+
+
+async def agenerate_linkedin_variants(topic: str, user_name: str, transcript: str, choices: list[Tuple[str, str]], writing_style: str = "authentic, professional", concurrency: Optional[int] = None, latency_tier: Optional[str] = None, slot: Optional[Callable[[], AsyncContextManager]] = None) -> list[dict]:
+    """
+    Generate one post per (content_type, template_id) choice concurrently.
+
+    At most `concurrency` completions run at once, never more than
+    LINKEDIN_BATCH_CONCURRENCY. Each variant runs inside `slot()` when given
+    (an admission slot). A failed variant does not fail the batch — it is
+    returned as {"contentType", "template", "error"}. Results keep the order of
+    `choices`. The transcript digest (if any) is computed once and shared by
+    every variant.
+    """
+    semaphore = asyncio.Semaphore(max(1, min(concurrency or LINKEDIN_BATCH_CONCURRENCY, LINKEDIN_BATCH_CONCURRENCY)))
+
+    async def _one(content_type: str, template_id: str) -> dict:
+        async with semaphore:
+            try:
+                if slot is None:
+                    return await agenerate_linkedin_post(
+                        topic, user_name, transcript, writing_style, content_type, template_id, latency_tier
+                    )
+                async with slot():
+                    return await agenerate_linkedin_post(
+                        topic, user_name, transcript, writing_style, content_type, template_id, latency_tier
+                    )
+            except Exception as e:
+                print(f"LinkedIn variant {content_type}/{template_id} failed: {e}")
+                return {"contentType": content_type, "template": template_id, "error": str(e)}
+
+    try:
+        # Warm the digest cache once so variants don't each wait on the condenser
+        await condense_transcript(transcript)
+    except Exception as e:
+        print(f"Transcript condensation failed before batch: {e}")
+
+    return await asyncio.gather(*[_one(c, t) for c, t in choices])
+
+
+async def stream_linkedin_post(topic: str, user_name: str, transcript: str, writing_style: str = "authentic, professional", content_type: Optional[str] = None, latency_tier: Optional[str] = None) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Stream a LinkedIn post as it is generated.
+
+    Yields ("token", {"text": ...}) for every content delta, then a single
+    ("done", {"linkedin": <assembled post>, "usage": {...}}) once the completion ends.
+
+    Routed like `agenerate_linkedin_post`, except that tokens already sent can't be
+    taken back — quality issues are reported in `route` but never escalated.
+    """
+    client = get_openai_client()
+    source, condensation = await condense_transcript(transcript)
+    messages, content_type, template_id = build_linkedin_messages(
+        topic, user_name, source, writing_style, content_type
+    )
+    route = choose_route(condensation["originalTokens"], content_type, latency_tier)
+
+    parts: list[str] = []
+    usage = None
+    finish_reason = None
+    # Only opening the stream is retried — once tokens have been yielded, a failure is final
+    model, stream = await call_upstream(
+        "openai",
+        "linkedin_post_stream",
+        lambda model: client.chat.completions.create(
+            **_completion_kwargs(messages, model, route["maxTokens"]),
+            stream=True,
+            stream_options={"include_usage": True},
+        ),
+        _models_for(route["model"]),
+    )
+    # Covers the rest of the stream, i.e. time until the last token
+    with track_upstream("openai", "linkedin_post_stream_tokens"):
+        async for chunk in stream:
+            # The final chunk carries usage and no choices
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield "token", {"text": delta}
+
+    usage = usage_to_dict(usage)
+    record_token_usage("openai", model, usage)
+    text = "".join(parts).strip()
+    LINKEDIN_ROUTES.inc(route["name"], model, "false")
+
+    yield "done", {
+        "linkedin": text,
+        "contentType": content_type,
+        "template": template_id,
+        "model": model,
+        "route": {
+            "name": route["name"],
+            "tier": route["tier"],
+            "transcriptTokens": condensation["originalTokens"],
+            "escalated": False,
+            "qualityIssues": check_post(text, finish_reason),
+        },
+        "usage": usage,
+        "transcript": condensation,
+    }
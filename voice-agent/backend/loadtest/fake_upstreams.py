@@ -0,0 +1,188 @@
+"""
+Local stand-ins for the OpenAI chat-completions and Perplexity APIs.
+
+Both endpoints answer with plausible payloads after a simulated latency, so the
+backend can be load-tested without spending real API credits.
+
+    python loadtest/fake_upstreams.py --port 9100 --latency-ms 800 --error-rate 0.01 --ratelimit-rate 0.02
+
+Point the backend at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1  PERPLEXITY_BASE_URL=http://127.0.0.1:9100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Simulation knobs (overridable via CLI flags or FAKE_* environment variables)
+CONFIG = {
+    "latency_ms": float(os.getenv("FAKE_LATENCY_MS", "800")),  # median total latency
+    "latency_sigma": float(os.getenv("FAKE_LATENCY_SIGMA", "0.5")),  # lognormal spread
+    "ttft_ms": float(os.getenv("FAKE_TTFT_MS", "250")),  # time to first streamed token
+    "error_rate": float(os.getenv("FAKE_ERROR_RATE", "0")),  # share of 500s
+    "ratelimit_rate": float(os.getenv("FAKE_RATELIMIT_RATE", "0")),  # share of 429s
+    "completion_tokens": int(os.getenv("FAKE_COMPLETION_TOKENS", "200")),
+    # share of posts that fail linkedin_router.check_post (one short paragraph), so some get escalated
+    "weak_post_rate": float(os.getenv("FAKE_WEAK_POST_RATE", "0")),
+}
+
+app = FastAPI(title="Fake upstreams")
+stats = {"openai": 0, "perplexity": 0, "errors": 0, "ratelimited": 0, "weak_posts": 0}
+
+FAKE_POST_WORDS = (
+    "Used to spend four hours on outreach. Now I spend forty five minutes. "
+    "The shift was automation. Best automation handles data, not relationships. "
+    "What manual task are you still doing?"
+).split()
+
+FAKE_PARAGRAPH_WORDS = 25
+FAKE_MIN_POST_WORDS = 80  # ~450 characters: clears LINKEDIN_MIN_POST_CHARS (400)
+
+FAKE_RESEARCH = {
+    "title": "Simulated research segment",
+    "deep_context": "Simulated deep context paragraph. " * 40,
+    "key_insights": ["Insight one", "Insight two", "Insight three"],
+    "discussion_points": [f"Discussion point {i}" for i in range(5)],
+    "sources": ["simulated"],
+}
+
+
+def _latency_seconds() -> float:
+    median = CONFIG["latency_ms"] / 1000
+    return random.lognormvariate(0, CONFIG["latency_sigma"]) * median
+
+
+def _injected_failure():
+    """Return an error response for a share of requests, per the configured rates."""
+    roll = random.random()
+    if roll < CONFIG["ratelimit_rate"]:
+        stats["ratelimited"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (simulated)", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+    if roll < CONFIG["ratelimit_rate"] + CONFIG["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse({"error": {"message": "Internal error (simulated)", "type": "server_error"}}, status_code=500)
+    return None
+
+
+def _usage(prompt_chars: int) -> dict:
+    prompt_tokens = max(1, prompt_chars // 4)
+    cached = (prompt_tokens // 1024) * 1024 if prompt_tokens >= 1024 else 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": CONFIG["completion_tokens"],
+        "total_tokens": prompt_tokens + CONFIG["completion_tokens"],
+        "prompt_tokens_details": {"cached_tokens": cached},
+    }
+
+
+def _completion_text(n_words: int) -> str:
+    """A post that passes check_post (blank-line paragraphs, 400+ chars), or for a
+    `weak_post_rate` share of calls a single short paragraph that fails it."""
+    if random.random() < CONFIG["weak_post_rate"]:
+        stats["weak_posts"] += 1
+        return " ".join(FAKE_POST_WORDS[i % len(FAKE_POST_WORDS)] for i in range(min(n_words, 40)))
+    words = [FAKE_POST_WORDS[i % len(FAKE_POST_WORDS)] for i in range(max(n_words, FAKE_MIN_POST_WORDS))]
+    paragraphs = [" ".join(words[i:i + FAKE_PARAGRAPH_WORDS]) for i in range(0, len(words), FAKE_PARAGRAPH_WORDS)]
+    return "\n\n".join(paragraphs)
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request):
+    stats["openai"] += 1
+    body = await request.json()
+    failure = _injected_failure()
+    if failure is not None:
+        await asyncio.sleep(CONFIG["ttft_ms"] / 1000)
+        return failure
+
+    model = body.get("model", "gpt-4o")
+    prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    n_words = max(1, CONFIG["completion_tokens"] * 3 // 4)
+    created = int(time.time())
+
+    if body.get("stream"):
+        total = _latency_seconds()
+        ttft = min(CONFIG["ttft_ms"] / 1000, total)
+        pieces = _completion_text(n_words).split(" ")
+        per_token = max(total - ttft, 0) / len(pieces)
+
+        async def chunks():
+            await asyncio.sleep(ttft)
+            for i, word in enumerate(pieces):
+                chunk = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(per_token)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                final = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [], "usage": _usage(prompt_chars),
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    await asyncio.sleep(_latency_seconds())
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": _completion_text(n_words)}, "finish_reason": "stop"}],
+        "usage": _usage(prompt_chars),
+    }
+
+
+@app.post("/chat/completions")
+async def perplexity_chat(request: Request):
+    stats["perplexity"] += 1
+    await request.body()
+    failure = _injected_failure()
+    if failure is not None:
+        await asyncio.sleep(CONFIG["ttft_ms"] / 1000)
+        return failure
+    await asyncio.sleep(_latency_seconds())
+    return {
+        "id": "pplx-fake",
+        "model": "sonar",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(FAKE_RESEARCH)}, "finish_reason": "stop"}],
+    }
+
+
+@app.head("/")
+async def root_head():
+    return None
+
+
+@app.get("/stats")
+def get_stats():
+    return {**stats, "config": CONFIG}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI + Perplexity upstreams")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    for key, value in CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+    for key in CONFIG:
+        CONFIG[key] = getattr(args, key)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
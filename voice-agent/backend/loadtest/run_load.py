@@ -0,0 +1,221 @@
+"""
+End-to-end load harness for the FastAPI app, against local fake upstreams.
+
+Starts loadtest/fake_upstreams.py and the app (uvicorn main:app) as subprocesses,
+points the app at the fakes, then drives mixed traffic across /agent-config,
+/api/research, /transcript and /generate-linkedin at each concurrency level and
+reports throughput and p50/p95/p99 latency per endpoint. Admission control is
+off in the spawned app unless --admission is given; 429s are counted in their
+own column either way, never as successes or errors.
+
+    python loadtest/run_load.py --concurrency 1,8,32,64 --duration 15
+    python loadtest/run_load.py --fake-latency-ms 2000 --fake-ratelimit-rate 0.05
+    python loadtest/run_load.py --admission          # measure with admission limits on
+    python loadtest/run_load.py --base-url http://127.0.0.1:8000   # existing app, no subprocesses
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_UPSTREAMS = os.path.join(BACKEND_DIR, "loadtest", "fake_upstreams.py")
+
+DEFAULT_MIX = "agent-config=35,research=20,transcript=25,generate-linkedin=20"
+
+
+# --- request builders ---
+
+def _transcript_messages(n: int) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i}: we cut onboarding from 4 hours to 45 minutes."}
+        for i in range(n)
+    ]
+
+
+TRANSCRIPT_TEXT = "\n\n".join(
+    f"Sarah Chen: Story {i} — we quoted $8K, they said yes, and it changed how we price." for i in range(30)
+)
+
+
+def build_request(endpoint: str, keyword_pool: int) -> tuple[str, dict]:
+    if endpoint == "agent-config":
+        return "/agent-config", {
+            "topic": f"AI automation {random.randint(1, 50)}",
+            "userName": "Sarah Chen",
+            "global_context": "Small businesses are adopting AI agents. " * 20,
+            "key_questions": ["What changed first?", "What broke?", "What would you redo?"],
+        }
+    if endpoint == "research":
+        return "/api/research", {"keyword": f"trending topic {random.randint(1, keyword_pool)}"}
+    if endpoint == "transcript":
+        return "/transcript", {
+            "topic": "Pricing",
+            "userName": "Sarah Chen",
+            "messages": _transcript_messages(random.choice((20, 80, 200))),
+            "duration": 900,
+        }
+    if endpoint == "generate-linkedin":
+        return "/generate-linkedin", {"topic": "Pricing", "userName": "Sarah Chen", "transcript": TRANSCRIPT_TEXT}
+    raise ValueError(f"Unknown endpoint '{endpoint}'")
+
+
+# --- load loop ---
+
+class Results:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.rejected: dict[str, int] = {}  # 429s from admission control
+
+    def record(self, endpoint: str, seconds: float, status: Optional[int]) -> None:
+        if status is not None and status < 400:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+        elif status == 429:
+            self.rejected[endpoint] = self.rejected.get(endpoint, 0) + 1
+        else:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run_level(base_url: str, concurrency: int, duration: float, mix: dict[str, int], keyword_pool: int) -> Results:
+    results = Results()
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def worker(index: int):
+            # One user per worker; with --admission, each is rate limited on its own
+            headers = {"X-User-Id": f"load-{index}"}
+            while time.monotonic() < deadline:
+                endpoint = random.choices(endpoints, weights)[0]
+                path, body = build_request(endpoint, keyword_pool)
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, json=body, headers=headers)
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = None
+                results.record(endpoint, time.perf_counter() - start, status)
+
+        await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    return results
+
+
+def report(concurrency: int, duration: float, results: Results) -> None:
+    print(f"\n=== concurrency {concurrency} ({duration:.0f}s) ===")
+    print(f"{'endpoint':20s} {'ok':>7s} {'err':>5s} {'429':>5s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    total_ok = 0
+    for endpoint in sorted(set(results.latencies) | set(results.errors) | set(results.rejected)):
+        values = sorted(results.latencies.get(endpoint, []))
+        total_ok += len(values)
+        print(
+            f"{endpoint:20s} {len(values):7d} {results.errors.get(endpoint, 0):5d} {results.rejected.get(endpoint, 0):5d} "
+            f"{len(values) / duration:8.1f} {percentile(values, 50) * 1000:9.1f} "
+            f"{percentile(values, 95) * 1000:9.1f} {percentile(values, 99) * 1000:9.1f}"
+        )
+    print(
+        f"{'total':20s} {total_ok:7d} {sum(results.errors.values()):5d} "
+        f"{sum(results.rejected.values()):5d} {total_ok / duration:8.1f}"
+    )
+
+
+# --- process management ---
+
+def _spawn(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env)
+
+
+async def _wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+async def main_async(args) -> None:
+    mix = {k: int(v) for k, v in (item.split("=") for item in args.mix.split(","))}
+    levels = [int(c) for c in args.concurrency.split(",")]
+    processes: list[subprocess.Popen] = []
+    base_url: Optional[str] = args.base_url
+
+    try:
+        if base_url is None:
+            fake_url = f"http://127.0.0.1:{args.fake_port}"
+            processes.append(_spawn([
+                FAKE_UPSTREAMS, "--port", str(args.fake_port),
+                "--latency-ms", str(args.fake_latency_ms),
+                "--latency-sigma", str(args.fake_latency_sigma),
+                "--error-rate", str(args.fake_error_rate),
+                "--ratelimit-rate", str(args.fake_ratelimit_rate),
+                "--weak-post-rate", str(args.fake_weak_post_rate),
+            ], dict(os.environ)))
+            await _wait_until_up(f"{fake_url}/stats")
+
+            app_env = dict(
+                os.environ,
+                OPENAI_API_KEY="sk-fake",
+                OPENAI_BASE_URL=f"{fake_url}/v1",
+                PERPLEXITY_API_KEY="pplx-fake",
+                PERPLEXITY_BASE_URL=fake_url,
+                # Measure the app, not the per-user limits (a single worker exceeds USER_RATE_PER_MINUTE in seconds)
+                ADMISSION_ENABLED="1" if args.admission else "0",
+            )
+            processes.append(_spawn([
+                "-m", "uvicorn", "main:app", "--port", str(args.app_port), "--log-level", "warning",
+                "--workers", str(args.app_workers),
+            ], app_env))
+            base_url = f"http://127.0.0.1:{args.app_port}"
+            await _wait_until_up(f"{base_url}/health")
+
+        print(f"Target {base_url} | mix {mix} | research keyword pool {args.keyword_pool}")
+        for concurrency in levels:
+            results = await run_level(base_url, concurrency, args.duration, mix, args.keyword_pool)
+            report(concurrency, args.duration, results)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32,64", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,... traffic mix")
+    parser.add_argument("--keyword-pool", type=int, default=20, help="distinct research keywords (smaller = more cache hits)")
+    parser.add_argument("--base-url", default=None, help="target an already-running app instead of spawning one")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--app-workers", type=int, default=1)
+    parser.add_argument("--admission", action="store_true", help="keep admission control on in the spawned app")
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--fake-latency-ms", type=float, default=800)
+    parser.add_argument("--fake-latency-sigma", type=float, default=0.5)
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-ratelimit-rate", type=float, default=0.0)
+    parser.add_argument("--fake-weak-post-rate", type=float, default=0.0, help="share of fake posts that fail the quality check")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
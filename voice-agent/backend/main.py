@@ -1,7 +1,17 @@
-from fastapi import FastAPI
+# Imported first so the startup report covers every import below
+import startup
+startup.begin()
+
+from fastapi import FastAPI, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import Literal, Optional, Union
+import asyncio
+import importlib
+import json
+from contextlib import asynccontextmanager
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -10,14 +20,83 @@ from dotenv import load_dotenv
 load_dotenv()
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'), override=False)
 
-from agent_config import build_agent_config
+from agent_config import (
+    AGENT_CONFIG_USE_GRAPH,
+    build_agent_config,
+    compact_agent_config,
+    get_graph,
+    prompt_template,
+    research_topic_fields,
+)
 from transcript_processor import process_transcript
-from linkedin_writer import generate_linkedin_post
-from perplexity_service import research_topic
+from session_store import SessionGapError, SessionLimitError, TranscriptSession, session_store
+from draft_speculator import draft_status, maybe_start_draft, wait_for_draft
+from linkedin_writer import (
+    LINKEDIN_BATCH_MAX_VARIANTS,
+    agenerate_linkedin_post,
+    agenerate_linkedin_variants,
+    all_template_choices,
+    find_template,
+    stream_linkedin_post,
+)
+from research_cache import research_cache
+from research_prefetch import PREFETCH_TOP_N, research_prefetcher
+from job_store import TERMINAL, IdempotencyConflict, job_runner
+from artifact_store import KINDS, POST, RESEARCH, TRANSCRIPT, artifact_store
 from fastapi import HTTPException
+from upstream import UpstreamError
+from admission import AdmissionRejected
+from response_encoding import CompressionMiddleware, FastJSONResponse
+import admission
+import clients
+import metrics
+import serve
+
+
+def _warm_agent_config():
+    if AGENT_CONFIG_USE_GRAPH:
+        get_graph()
+    build_agent_config("Warm-up", "", "", [], "Guest")
+    prompt_template()
+
+
+startup.register_warmup("openai", lambda: importlib.import_module("openai"))
+# Without a key the SDK refuses to build a client; leave that to fail on first use
+if os.environ.get("OPENAI_API_KEY"):
+    startup.register_warmup("openai_client", clients.get_openai_client)
+startup.register_warmup("agent_config", _warm_agent_config)
+serve.on_drain(job_runner.drain)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream client per process, shared by every request
+    with startup.phase("clients"):
+        await clients.startup()
+    with startup.phase("artifact_store"):
+        artifact_store.open()
+    with startup.phase("research_prefetcher"):
+        research_prefetcher.start()
+    with startup.phase("job_runner"):
+        job_runner.start()
+    startup.started()
+    serve.install_drain_handler()
+    # Off the startup path: the port opens now and warm-up finishes in the background
+    warmup = asyncio.create_task(startup.warmup()) if startup.STARTUP_WARMUP else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    # After a SIGTERM, running jobs get whatever is left of the drain budget
+    await job_runner.stop(serve.drain_remaining())
+    await research_prefetcher.stop()
+    artifact_store.close()
+    await clients.shutdown()
 
-app = FastAPI(title="Podcast Studio API")
 
+app = FastAPI(title="Podcast Studio API", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:5174", "http://localhost:3000"],
@@ -26,6 +105,25 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(UpstreamError)
+async def upstream_error_handler(request, exc: UpstreamError):
+    # Circuit open -> 503, deadline exceeded -> 504
+    return JSONResponse({"detail": str(exc)}, status_code=exc.status_code)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    return JSONResponse(
+        {"detail": str(exc), "reason": exc.reason},
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def _admission_user(request: Request, user_name: Optional[str] = None) -> str:
+    return admission.user_key(request.headers, user_name, request.client.host if request.client else None)
+
+
 class TopicRequest(BaseModel):
     topic_title: Optional[str] = None
     topic: Optional[str] = None  # simple string fallback from frontend
@@ -34,6 +132,7 @@ class TopicRequest(BaseModel):
     key_questions: Optional[list[str]] = []
     user_name: Optional[str] = "Guest"
     userName: Optional[str] = None  # support camelCase from frontend
+    target_length: Optional[Literal["short", "medium", "long"]] = "short"
 
     def get_topic_title(self) -> str:
         return self.topic_title or self.topic or "General Discussion"
@@ -49,10 +148,37 @@ class TranscriptRequest(BaseModel):
     duration: Optional[int] = 0
 
 
+class SessionOpenRequest(BaseModel):
+    topic: Optional[str] = "General Discussion"
+    userName: Optional[str] = "Guest"
+    speculativeDraft: bool = False  # opt-in: draft the LinkedIn post while the call runs
+
+
+class SessionAppendRequest(BaseModel):
+    messages: list[dict] = []
+    offset: Optional[int] = Field(None, ge=0)  # index of messages[0] in the conversation; enables safe resends
+
+
+class SessionFinalizeRequest(BaseModel):
+    duration: Optional[int] = 0
+
+
 class LinkedInRequest(BaseModel):
     topic: str
     userName: Optional[str] = "Guest"
-    transcript: str
+    transcript: Optional[str] = None
+    transcript_id: Optional[str] = None  # id from /transcript or a finalized session, instead of the full text
+    latencyTier: Optional[Literal["fast", "balanced", "quality"]] = None  # default LINKEDIN_DEFAULT_TIER
+
+
+class LinkedInVariant(BaseModel):
+    content_type: str
+    template: str
+
+
+class LinkedInBatchRequest(LinkedInRequest):
+    variants: Union[Literal["all"], list[LinkedInVariant]] = "all"
+    concurrency: Optional[int] = None
 
 
 @app.get("/health")
@@ -60,54 +186,496 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready(response: Response):
+    """Readiness probe: 503 while starting, warming up or draining; /health stays the liveness probe."""
+    is_ready, status = serve.readiness()
+    if not is_ready:
+        response.status_code = 503
+    return {
+        "ready": is_ready,
+        "status": status,
+        "pid": os.getpid(),
+        "admission": admission.stats(),
+        "jobs": job_runner.stats(),
+    }
+
+
+@app.get("/startup")
+def startup_report():
+    """Cold-start breakdown: import time per package, lifespan init phases and warm-up."""
+    return startup.report()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text exposition of request, upstream and token metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+ConfigFormat = Literal["full", "compact"]
+
+
 @app.post("/agent-config")
-def agent_config(req: TopicRequest):
+def agent_config(req: TopicRequest, format: ConfigFormat = "full"):
+    """`?format=compact` returns a prompt template id + the outline instead of the full prompt."""
     config = build_agent_config(
         topic_title=req.get_topic_title(),
         global_context=req.global_context or "",
         why_this_matters=req.why_this_matters or "",
         key_questions=req.key_questions or [],
         user_name=req.get_user_name(),
+        target_length=req.target_length or "short",
     )
-    return config
+    return compact_agent_config(config) if format == "compact" else config
+
+
+@app.get("/agent-config/templates/{template_id}")
+def agent_config_template(template_id: str, if_none_match: Optional[str] = Header(None)):
+    """Static part of compact agent configs. Immutable per id, so clients cache it and revalidate with If-None-Match."""
+    template = prompt_template()
+    if template_id != template["templateId"]:
+        raise HTTPException(status_code=404, detail="Unknown or outdated prompt template")
+    # Weak: CompressionMiddleware may serve this entity as gzip, brotli or identity
+    etag = f'W/"{template_id}"'
+    # Private: the Deepgram settings carry the ElevenLabs key
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if if_none_match and (if_none_match.strip() == "*" or etag.removeprefix("W/") in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(template, headers=headers)
+
+
+def _store_transcript(result: dict, user_key: str, session_id: Optional[str] = None) -> dict:
+    """Keep the formatted transcript so later calls can pass `transcript_id` instead of the text."""
+    result["transcriptId"] = artifact_store.put(
+        TRANSCRIPT,
+        result["transcript"],
+        user_key=user_key,
+        session_id=session_id,
+        meta={"topic": result["topic"], "userName": result["userName"], "duration": result["duration"]},
+    )
+    return result
 
 
 @app.post("/transcript")
-def transcript(req: TranscriptRequest):
+def transcript(req: TranscriptRequest, request: Request):
     result = process_transcript(
         topic=req.topic or "General Discussion",
         user_name=req.userName or "Guest",
         messages=req.messages,
         duration=req.duration or 0,
     )
+    return _store_transcript(result, _admission_user(request, req.userName))
+
+
+def _get_session(session_id: str) -> TranscriptSession:
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+
+# Session handlers are all async: the store and draft tasks belong to the event loop thread
+@app.post("/sessions")
+async def open_session(req: SessionOpenRequest, request: Request):
+    session = session_store.create(
+        topic=req.topic or "General Discussion",
+        user_name=req.userName or "Guest",
+        speculative=req.speculativeDraft,
+        user_key=_admission_user(request, req.userName),
+    )
+    return {
+        "sessionId": session.id,
+        "topic": session.topic,
+        "userName": session.user_name,
+        "speculativeDraft": session.speculative,
+    }
+
+
+@app.post("/sessions/{session_id}/messages")
+async def append_session_messages(session_id: str, req: SessionAppendRequest):
+    session = _get_session(session_id)
+    if session.finalized:
+        raise HTTPException(status_code=409, detail="Session already finalized")
+    try:
+        appended = session.append(req.messages, offset=req.offset)
+    except SessionLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except SessionGapError as e:
+        return JSONResponse(
+            {"detail": str(e), "expectedOffset": e.expected_offset},
+            status_code=409,
+        )
+    draft_started = maybe_start_draft(session)
+    return {
+        "sessionId": session.id,
+        "appended": appended,
+        "messageCount": session.message_count,
+        "draftStarted": draft_started,
+    }
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Current transcript snapshot — lets a reloaded tab recover an in-progress session."""
+    return _get_session(session_id).result()
+
+
+@app.post("/sessions/{session_id}/finalize")
+async def finalize_session(session_id: str, req: SessionFinalizeRequest, request: Request):
+    session = _get_session(session_id)
+    session.finalized = True
+    session.duration = req.duration or 0
+    result = _store_transcript(session.result(), _admission_user(request, session.user_name), session.id)
+    if session.speculative:
+        result["draft"] = draft_status(session)
+    return result
+
+
+@app.get("/sessions/{session_id}/draft")
+async def get_session_draft(session_id: str, wait: float = 0):
+    """Speculative draft status; `wait` long-polls up to that many seconds (max 30) for an in-flight draft."""
+    session = _get_session(session_id)
+    if not session.speculative:
+        raise HTTPException(status_code=400, detail="Session was not opened with speculativeDraft")
+    return await wait_for_draft(session, min(max(wait, 0), 30))
+
+
+def _resolve_transcript(req: LinkedInRequest, user_key: str) -> tuple[str, str]:
+    """(text, transcript id) from `transcript_id`, or from the inline `transcript` after storing it."""
+    if req.transcript_id:
+        text = artifact_store.get_transcript(req.transcript_id, user_key)
+        if text is None:
+            raise HTTPException(status_code=404, detail=f"Transcript '{req.transcript_id}' not found")
+        return text, req.transcript_id
+    if req.transcript is None:
+        raise HTTPException(status_code=422, detail="Either transcript or transcript_id is required")
+    return req.transcript, artifact_store.put(TRANSCRIPT, req.transcript, user_key=user_key)
+
+
+def _store_post(result: dict, topic: str, transcript_id: str, user_key: str) -> dict:
+    result["transcriptId"] = transcript_id
+    result["postId"] = artifact_store.put(
+        POST,
+        {key: result.get(key) for key in ("linkedin", "contentType", "template", "model")},
+        user_key=user_key,
+        parent_id=transcript_id,
+        meta={"topic": topic, "contentType": result.get("contentType"), "template": result.get("template")},
+    )
     return result
 
 
 @app.post("/generate-linkedin")
-def generate_linkedin(req: LinkedInRequest):
-    post = generate_linkedin_post(
+async def generate_linkedin(req: LinkedInRequest, request: Request):
+    user_key = _admission_user(request, req.userName)
+    transcript_text, transcript_id = _resolve_transcript(req, user_key)
+    async with admission.admit("openai", user_key):
+        result = await agenerate_linkedin_post(
+            topic=req.topic,
+            user_name=req.userName or "Guest",
+            transcript=transcript_text,
+            latency_tier=req.latencyTier,
+        )
+    return _store_post(result, req.topic, transcript_id, user_key)
+
+
+@app.post("/generate-linkedin/batch")
+async def generate_linkedin_batch(req: LinkedInBatchRequest, request: Request):
+    """Generate several template variants concurrently; failed variants carry an `error` instead of a post."""
+    if req.variants == "all":
+        choices = all_template_choices()
+    else:
+        choices = [(v.content_type, v.template) for v in req.variants]
+        for content_type, template_id in choices:
+            try:
+                find_template(content_type, template_id)
+            except KeyError as e:
+                raise HTTPException(status_code=400, detail=str(e.args[0]))
+    if len(choices) > LINKEDIN_BATCH_MAX_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"At most {LINKEDIN_BATCH_MAX_VARIANTS} variants per batch")
+
+    user_key = _admission_user(request, req.userName)
+    transcript_text, transcript_id = _resolve_transcript(req, user_key)
+    # Every variant is an OpenAI call: charge one rate token each up front (all or
+    # nothing), then hold one provider slot per variant while it runs
+    admission.charge("openai", user_key, len(choices))
+    results = await agenerate_linkedin_variants(
         topic=req.topic,
         user_name=req.userName or "Guest",
-        transcript=req.transcript,
+        transcript=transcript_text,
+        choices=choices,
+        concurrency=req.concurrency,
+        latency_tier=req.latencyTier,
+        slot=lambda: admission.admit("openai", user_key, charge=False),
+    )
+    for result in results:
+        if "error" not in result:
+            _store_post(result, req.topic, transcript_id, user_key)
+    failed = sum(1 for r in results if "error" in r)
+    return {"variants": results, "transcriptId": transcript_id, "succeeded": len(results) - failed, "failed": failed}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/generate-linkedin/stream")
+async def generate_linkedin_stream(req: LinkedInRequest, request: Request):
+    """Server-Sent Events variant of /generate-linkedin: `token` events, then one `done` event."""
+    user_key = _admission_user(request, req.userName)
+    transcript_text, transcript_id = _resolve_transcript(req, user_key)
+    # Admit before sending headers so a rejection is still a real 429
+    ticket = await admission.acquire("openai", user_key)
+
+    def release():
+        if ticket is not None:
+            ticket.release()
+
+    async def events():
+        try:
+            async for event, data in stream_linkedin_post(
+                topic=req.topic,
+                user_name=req.userName or "Guest",
+                transcript=transcript_text,
+                latency_tier=req.latencyTier,
+            ):
+                if event == "done":
+                    _store_post(data, req.topic, transcript_id, user_key)
+                yield _sse(event, data)
+        except Exception as e:
+            # Headers are already sent, so report failures in-band
+            print(f"Error in LinkedIn stream: {e}")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            release()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Covers a client that disconnects before the stream starts (release is idempotent)
+        background=BackgroundTask(release),
     )
-    return {"linkedin": post}
 
 
 class ResearchRequest(BaseModel):
     keyword: str
 
 
+class PrefetchRequest(BaseModel):
+    keywords: list[str]
+    top_n: Optional[int] = None
+
+
+class EpisodePrepareRequest(BaseModel):
+    topic: str  # keyword picked by the user; researched, then used as the topic title
+    user_name: Optional[str] = "Guest"
+    userName: Optional[str] = None  # support camelCase from frontend
+    target_length: Optional[Literal["short", "medium", "long"]] = "short"
+
+    def get_user_name(self) -> str:
+        return self.userName or self.user_name or "Guest"
+
+
+def _store_research(keyword: str, result, user_key: Optional[str] = None) -> str:
+    return artifact_store.put(RESEARCH, result, user_key=user_key, meta={"keyword": keyword})
+
+
+async def _cached_research(keyword: str, http_request: Request, user_name: Optional[str] = None):
+    """research_cache.get_with_match, admitted against the Perplexity limits only when it may go upstream."""
+    if research_cache.peek(keyword) is not None:
+        return await research_cache.get_with_match(keyword)
+    async with admission.admit("perplexity", _admission_user(http_request, user_name)):
+        return await research_cache.get_with_match(keyword)
+
+
 @app.post("/api/research")
-async def research_endpoint(request: ResearchRequest):
+async def research_endpoint(request: ResearchRequest, response: Response, http_request: Request):
     try:
         print(f"Received research request for: {request.keyword}")
-        result = research_topic(request.keyword)
+        result, cache_status, match = await _cached_research(request.keyword, http_request)
+        research_prefetcher.record_lookup(match["key"], cache_status)
+        response.headers["X-Cache"] = cache_status
+        research_id = _store_research(request.keyword, result, _admission_user(http_request))
         # Wrap result in "output" key to match frontend expectation
-        return {"output": result}
+        return {"output": result, "researchId": research_id, "researchMatch": match}
+    except (UpstreamError, AdmissionRejected):
+        raise
     except Exception as e:
         print(f"Error in research endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# async: the prefetcher's queue belongs to the event loop
+@app.post("/api/research/prefetch")
+async def research_prefetch(request: PrefetchRequest):
+    """Queue upcoming (e.g. trending) keywords for background research."""
+    return research_prefetcher.submit(request.keywords, request.top_n or PREFETCH_TOP_N)
+
+
+@app.post("/episode/prepare")
+async def prepare_episode(req: EpisodePrepareRequest, response: Response, request: Request, format: ConfigFormat = "full"):
+    """Research the topic (through the cache) and return the ready agent config in one call."""
+    try:
+        research, cache_status, match = await _cached_research(req.topic, request, req.get_user_name())
+    except (UpstreamError, AdmissionRejected):
+        raise
+    except Exception as e:
+        print(f"Error researching episode topic: {e}")
+        raise HTTPException(status_code=502, detail=f"Research failed: {e}")
+    research_prefetcher.record_lookup(match["key"], cache_status)
+    response.headers["X-Cache"] = cache_status
+
+    config = build_agent_config(
+        topic_title=req.topic,
+        user_name=req.get_user_name(),
+        target_length=req.target_length or "short",
+        **research_topic_fields(research),
+    )
+    research_id = _store_research(req.topic, research, _admission_user(request, req.get_user_name()))
+    if format == "compact":
+        config = compact_agent_config(config)
+    return {
+        **config,
+        "research": research,
+        "researchId": research_id,
+        "researchCache": cache_status,
+        "researchMatch": match,
+    }
+
+
+@app.get("/api/research/prefetch/stats")
+def research_prefetch_stats():
+    return {"prefetch": research_prefetcher.stats(), "cache": research_cache.stats()}
+
+
+# --- async jobs ---
+
+async def _linkedin_job(request: dict, user_key: str) -> dict:
+    transcript_id = request["transcript_id"]  # resolved when the job was submitted
+    transcript_text = artifact_store.get_transcript(transcript_id, user_key)
+    if transcript_text is None:
+        raise LookupError(f"Transcript '{transcript_id}' not found")
+    result = await agenerate_linkedin_post(
+        topic=request["topic"],
+        user_name=request.get("userName") or "Guest",
+        transcript=transcript_text,
+        latency_tier=request.get("latencyTier"),
+    )
+    return _store_post(result, request["topic"], transcript_id, user_key)
+
+
+async def _research_job(request: dict, user_key: str) -> dict:
+    result, cache_status, match = await research_cache.get_with_match(request["keyword"])
+    research_prefetcher.record_lookup(match["key"], cache_status)
+    return {
+        "output": result,
+        "researchId": _store_research(request["keyword"], result, user_key),
+        "cache": cache_status,
+        "researchMatch": match,
+    }
+
+
+job_runner.register("generate-linkedin", "openai", _linkedin_job)
+job_runner.register("research", "perplexity", _research_job)
+
+
+def _submit_job(kind: str, payload: dict, http_request: Request, response: Response, idempotency_key: Optional[str], user_name: Optional[str] = None) -> dict:
+    try:
+        job, created = job_runner.submit(kind, payload, _admission_user(http_request, user_name), idempotency_key)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    response.status_code = 202 if created else 200
+    response.headers["Location"] = f"/jobs/{job['jobId']}"
+    return job
+
+
+# async: job_runner.submit() uses an asyncio.Queue, which is only safe on the event loop thread
+@app.post("/jobs/generate-linkedin", status_code=202)
+async def submit_linkedin_job(req: LinkedInRequest, request: Request, response: Response, idempotency_key: Optional[str] = Header(None)):
+    """Queue a /generate-linkedin call; returns the job at once (202, or 200 when the Idempotency-Key matched)."""
+    user_key = _admission_user(request, req.userName)
+    # Jobs carry only the transcript id, never the text
+    _, transcript_id = _resolve_transcript(req, user_key)
+    payload = req.model_dump(exclude={"transcript"})
+    payload["transcript_id"] = transcript_id
+    return _submit_job("generate-linkedin", payload, request, response, idempotency_key, req.userName)
+
+
+@app.post("/jobs/research", status_code=202)
+async def submit_research_job(req: ResearchRequest, request: Request, response: Response, idempotency_key: Optional[str] = Header(None)):
+    """Queue an /api/research call; returns the job at once."""
+    return _submit_job("research", req.model_dump(), request, response, idempotency_key)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Job status and result; `wait` long-polls up to that many seconds (max 30) for it to finish."""
+    job = await job_runner.wait(job_id, min(max(wait, 0), 30))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events: a `status` event on every change, then `done` with the finished job."""
+    job = job_runner.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    async def events():
+        current = job
+        yield _sse("status", {"jobId": job_id, "status": current["status"]})
+        while current["status"] not in TERMINAL:
+            latest = await job_runner.wait(job_id, 15, changed_from=current["status"])
+            if latest is None:
+                yield _sse("error", {"detail": "Job expired"})
+                return
+            if latest["status"] != current["status"]:
+                yield _sse("status", {"jobId": job_id, "status": latest["status"]})
+            else:
+                yield ": keep-alive\n\n"
+            current = latest
+        yield _sse("done", current)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    """Upstream slots in use and queue depth per provider."""
+    return admission.stats()
+
+
+@app.get("/artifacts")
+def list_artifacts(
+    request: Request,
+    kind: Optional[str] = None,
+    session_id: Optional[str] = None,
+    parent_id: Optional[str] = None,
+    userName: Optional[str] = None,
+    limit: int = 20,
+):
+    """The caller's stored transcripts, research and posts, newest first (summaries, no bodies)."""
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown artifact kind '{kind}'")
+    user_key = _admission_user(request, userName)
+    return {"artifacts": artifact_store.list(user_key, kind, session_id, parent_id, limit)}
+
+
+@app.get("/artifacts/{artifact_id}")
+def get_artifact(artifact_id: str, request: Request, userName: Optional[str] = None):
+    """One of the caller's artifacts with its body; 404 for artifacts the caller never stored."""
+    artifact = artifact_store.get(artifact_id, _admission_user(request, userName))
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return artifact
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,237 @@
+"""
+Prometheus-style metrics, exposed at GET /metrics in the text exposition format.
+
+Kept dependency-free: a handful of counters, gauges and histograms with labels,
+an ASGI middleware for per-route request metrics, and `track_upstream` for
+timing calls to OpenAI / Perplexity separately from our own processing.
+
+Single-process only — with multiple workers each process reports its own values.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from starlette.routing import Match
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Seconds spent waiting on upstream calls during the current request
+_upstream_seconds: ContextVar[Optional[list]] = ContextVar("upstream_seconds", default=None)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        REGISTRY.append(self)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float) -> None:
+        self._values[labels] = value
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, series in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.label_names, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = _format_labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests handled.", ("route", "method", "status"))
+HTTP_DURATION = Histogram("http_request_duration_seconds", "End-to-end request latency.", ("route",))
+HTTP_PROCESSING = Histogram(
+    "http_request_processing_seconds",
+    "Request latency excluding time spent waiting on upstream APIs.",
+    ("route",),
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.", ("route",))
+
+UPSTREAM_DURATION = Histogram("upstream_request_duration_seconds", "Latency of upstream API calls.", ("provider", "operation"))
+UPSTREAM_ERRORS = Counter("upstream_errors_total", "Failed upstream API calls.", ("provider", "operation", "reason"))
+UPSTREAM_IN_FLIGHT = Gauge("upstream_requests_in_flight", "Upstream API calls currently in progress.", ("provider",))
+UPSTREAM_RETRIES = Counter("upstream_retries_total", "Upstream calls retried after a 429/5xx/transport error.", ("provider", "operation"))
+UPSTREAM_HEDGES = Counter("upstream_hedged_requests_total", "Hedged second requests sent after p95 latency.", ("provider", "operation"))
+UPSTREAM_FALLBACKS = Counter("upstream_fallbacks_total", "Calls served by a fallback model.", ("provider", "operation", "model"))
+CIRCUIT_STATE = Gauge("upstream_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open).", ("provider", "model"))
+
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requests rejected with 429 by admission control.", ("provider", "reason"))
+ADMISSION_QUEUED = Gauge("admission_queued_requests", "Requests waiting for an upstream slot.", ("provider",))
+
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by completion `usage` fields.", ("provider", "model", "kind"))
+LINKEDIN_ROUTES = Counter("linkedin_routes_total", "LinkedIn generations by route, final model and escalation.", ("route", "model", "escalated"))
+RESEARCH_KEYWORD_REUSE = Counter("research_keyword_reuse_total", "Research served from an entry stored for a different keyword.", ("match",))
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# --- upstream instrumentation ---
+
+def _error_reason(error: BaseException) -> str:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    if status is not None:
+        return str(status)
+    name = type(error).__name__.lower()
+    if "timeout" in name:
+        return "timeout"
+    if "connect" in name:
+        return "connection"
+    return type(error).__name__
+
+
+@contextmanager
+def track_upstream(provider: str, operation: str) -> Iterator[None]:
+    """Time an upstream call, count failures by reason, and attribute the wait to the current request."""
+    UPSTREAM_IN_FLIGHT.inc(provider)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        UPSTREAM_ERRORS.inc(provider, operation, _error_reason(e))
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        UPSTREAM_IN_FLIGHT.dec(provider)
+        UPSTREAM_DURATION.observe(elapsed, provider, operation)
+        waited = _upstream_seconds.get()
+        if waited is not None:
+            waited[0] += elapsed
+
+
+def record_token_usage(provider: str, model: str, usage: dict) -> None:
+    """Count tokens from a usage dict as produced by token_utils.usage_to_dict."""
+    if not usage:
+        return
+    LLM_TOKENS.inc(provider, model, "prompt", amount=usage.get("prompt_tokens", 0))
+    LLM_TOKENS.inc(provider, model, "cached_prompt", amount=usage.get("cached_prompt_tokens", 0))
+    LLM_TOKENS.inc(provider, model, "completion", amount=usage.get("completion_tokens", 0))
+
+
+# --- HTTP middleware ---
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (doesn't buffer streaming responses) recording per-route metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route_name(self, scope) -> str:
+        # Label by route template (/sessions/{session_id}) so label cardinality stays bounded
+        router = scope["app"].router
+        for route in router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", scope["path"])
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route_name(scope)
+        status = {"code": 500}
+        waited = [0.0]
+        token = _upstream_seconds.set(waited)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _upstream_seconds.reset(token)
+            HTTP_IN_FLIGHT.dec(route)
+            HTTP_REQUESTS.inc(route, scope["method"], str(status["code"]))
+            HTTP_DURATION.observe(elapsed, route)
+            # Concurrent upstream calls (batch generation) can overlap, so clamp at zero
+            HTTP_PROCESSING.observe(max(elapsed - waited[0], 0.0), route)
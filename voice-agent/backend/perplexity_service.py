@@ -1,14 +1,33 @@
 import os
-import requests
+import re
+import httpx
 import json
 from typing import Dict, Any, Optional
 
-PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
+from clients import PERPLEXITY_BASE_URL, get_perplexity_client
+from metrics import record_token_usage
+from upstream import call_upstream
+
+PERPLEXITY_API_URL = f"{PERPLEXITY_BASE_URL.rstrip('/')}/chat/completions"
 PERPLEXITY_MODEL = "sonar" 
 
-def research_topic(keyword: str) -> Dict[str, Any]:
+# Minimum token-set (Jaccard) similarity for a keyword to reuse research done for another
+RESEARCH_MATCH_THRESHOLD = float(os.getenv("RESEARCH_MATCH_THRESHOLD", "0.8"))
+STOP_WORDS = frozenset(
+    "a about an and are as at be by does for from how in into is it its of on or "
+    "the their this to vs versus what when where which who why with".split()
+)
+# Words that end in "s" (or "ies") without being a plural of a shorter key word
+PLURAL_EXCEPTIONS = frozenset(
+    "news series species means sales physics ethics analytics economics politics "
+    "kubernetes devops mlops macos windows canvas pandas atlas lens movies cookies calories".split()
+)
+_TOKEN_RE = re.compile(r"[A-Za-z0-9+#]+")
+
+async def research_topic(keyword: str) -> Dict[str, Any]:
     """
     Research a topic using Perplexity API and return a single comprehensive context.
+    Runs on the shared pooled httpx client, so it never blocks the event loop.
     """
     api_key = os.getenv("PERPLEXITY_API_KEY")
     if not api_key:
@@ -35,7 +54,6 @@ def research_topic(keyword: str) -> Dict[str, Any]:
     }
     
     payload = {
-        "model": PERPLEXITY_MODEL,
         "messages": [
             {
                 "role": "system",
@@ -49,36 +67,163 @@ def research_topic(keyword: str) -> Dict[str, Any]:
         "temperature": 0.7  # Slight creativity but grounded research
     }
     
-    try:
-        response = requests.post(PERPLEXITY_API_URL, headers=headers, json=payload, timeout=60)
+    client = get_perplexity_client()
+
+    async def _post(model: str) -> httpx.Response:
+        response = await client.post(PERPLEXITY_API_URL, headers=headers, json={"model": model, **payload})
         response.raise_for_status()
-        
+        return response
+
+    try:
+        # Deadline, retries on 429/5xx and the circuit breaker live in the upstream layer
+        model, response = await call_upstream("perplexity", "research", _post, [PERPLEXITY_MODEL])
+
         data = response.json()
+        record_token_usage("perplexity", model, _usage(data.get("usage")))
         content = data["choices"][0]["message"]["content"]
-        
-        # Parse JSON from content (handle markdown code blocks if present)
-        clean_content = content.strip()
-        if clean_content.startswith("```json"):
-            clean_content = clean_content[7:]
-        if clean_content.endswith("```"):
-            clean_content = clean_content[:-3]
-        
-        try:
-             result_json = json.loads(clean_content.strip())
-             return result_json
-        except json.JSONDecodeError:
-            # Fallback if AI didn't return valid JSON
-            return {
-                "title": f"Research on {keyword}",
-                "deep_context": content,
-                "key_insights": [],
-                "discussion_points": [],
-                "sources": []
-            }
+        return parse_research_content(keyword, content)
             
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Perplexity API Request Error: {e}")
         raise e
     except Exception as e:
         print(f"Error in research_topic: {e}")
         raise e
+
+
+# --- Keyword canonicalization ---
+# "AI agents debugging", "debugging AI agents" and "AI Agent Debugging " all become
+# the canonical key "agent ai debugging": case folded, punctuation and stop words
+# dropped, plurals folded, tokens deduplicated and sorted. A stop word written in
+# capitals ("IT jobs", "WHO guidelines") is an acronym: it is kept, and kept in
+# capitals, so a canonical key canonicalizes to itself. Keys that still differ
+# can share research when their token sets are similar enough (KeywordIndex).
+
+
+def _fold_plural(token: str) -> str:
+    if token in PLURAL_EXCEPTIONS:
+        return token
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is", "ics")):
+        return token[:-1]
+    return token
+
+
+def _shouting(raw: list[str]) -> bool:
+    """Every word in capitals, at least one of them not a stop word ("HOW TO USE AI")."""
+    words = [t for t in raw if any(c.isalpha() for c in t)]
+    return bool(words) and all(t.isupper() for t in words) and any(t.lower() not in STOP_WORDS for t in words)
+
+
+def keyword_tokens(keyword: str) -> frozenset:
+    raw = _TOKEN_RE.findall(keyword)
+    shouting = _shouting(raw)
+    tokens, content = [], []
+    for t in raw:
+        if len(t) > 1 and t.isupper() and t.lower() in STOP_WORDS and not shouting:
+            content.append(t)  # an acronym ("IT", "WHO"), not a stop word
+            continue
+        token = _fold_plural(t.lower())
+        tokens.append(token)
+        if token not in STOP_WORDS:
+            content.append(token)
+    # A keyword made only of stop words ("the who") keeps them
+    return frozenset(content or tokens)
+
+
+def canonical_keyword(keyword: str) -> str:
+    """Order-, case- and stop-word-insensitive key for a research keyword; canonical keys map to themselves."""
+    tokens = keyword_tokens(keyword)
+    if not tokens:
+        return " ".join(keyword.lower().split())
+    return " ".join(sorted(tokens, key=lambda token: (token.lower(), token)))
+
+
+def keyword_similarity(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two token sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class KeywordIndex:
+    """Canonical keys of researched keywords, with a token -> keys map for similarity lookups."""
+
+    def __init__(self, threshold: float = RESEARCH_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._tokens: Dict[str, frozenset] = {}
+        self._by_token: Dict[str, set] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._tokens
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def add(self, key: str) -> None:
+        if key in self._tokens:
+            return
+        tokens = frozenset(key.split())
+        self._tokens[key] = tokens
+        for token in tokens:
+            self._by_token.setdefault(token, set()).add(key)
+
+    def discard(self, key: str) -> None:
+        tokens = self._tokens.pop(key, None)
+        for token in tokens or ():
+            keys = self._by_token.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_token[token]
+
+    def match(self, keyword: str) -> Optional[tuple]:
+        """(key, similarity) of the best indexed key at or above the threshold, else None."""
+        key = canonical_keyword(keyword)
+        if key in self._tokens:
+            return key, 1.0
+        tokens = frozenset(key.split())
+        # Only keys sharing a token can be similar; sizes outside [t*n, n/t] can't reach the threshold
+        candidates = set().union(*(self._by_token.get(token, ()) for token in tokens))
+        best, best_score = None, 0.0
+        for candidate in candidates:
+            other = self._tokens[candidate]
+            if not self.threshold * len(tokens) <= len(other) <= len(tokens) / self.threshold:
+                continue
+            score = keyword_similarity(tokens, other)
+            if score > best_score or (score == best_score and best is not None and candidate < best):
+                best, best_score = candidate, score
+        if best is None or best_score < self.threshold:
+            return None
+        return best, best_score
+
+
+def _usage(usage: Optional[dict]) -> dict:
+    if not usage:
+        return {}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+    }
+
+
+def parse_research_content(keyword: str, content: str) -> Dict[str, Any]:
+    """Parse the model's JSON answer (handles markdown code fences), with a plain-text fallback."""
+    clean_content = content.strip()
+    if clean_content.startswith("```json"):
+        clean_content = clean_content[7:]
+    if clean_content.endswith("```"):
+        clean_content = clean_content[:-3]
+
+    try:
+        return json.loads(clean_content.strip())
+    except json.JSONDecodeError:
+        # Fallback if AI didn't return valid JSON
+        return {
+            "title": f"Research on {keyword}",
+            "deep_context": content,
+            "key_insights": [],
+            "discussion_points": [],
+            "sources": []
+        }
@@ -0,0 +1,210 @@
+"""
+Research cache — TTL + LRU cache in front of Perplexity research.
+
+- Keys are canonical keywords (`perplexity_service.canonical_keyword`), so
+  "debugging AI agents" and "AI agents debugging" share an entry. A keyword with
+  no exact entry can reuse one whose token set is similar enough (KeywordIndex).
+- Entries expire after `ttl` seconds but are still served for up to `stale_ttl`
+  more seconds while a single background refresh runs (stale-while-revalidate).
+- Concurrent misses for the same key share one upstream call (single-flight).
+- Eviction is least-recently-used, bounded by entry count and approximate bytes.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from metrics import RESEARCH_KEYWORD_REUSE
+from perplexity_service import KeywordIndex, canonical_keyword, research_topic
+
+RESEARCH_CACHE_TTL = float(os.getenv("RESEARCH_CACHE_TTL", "900"))  # 15 min fresh
+RESEARCH_CACHE_STALE_TTL = float(os.getenv("RESEARCH_CACHE_STALE_TTL", "3600"))  # +1 h served stale
+RESEARCH_CACHE_MAX_ENTRIES = int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "512"))
+RESEARCH_CACHE_MAX_BYTES = int(os.getenv("RESEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Cache statuses reported back to callers
+HIT = "HIT"
+MISS = "MISS"
+STALE = "STALE"
+
+Loader = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Cache key for a keyword: case, whitespace, word order, plurals and stop words folded."""
+    return canonical_keyword(keyword)
+
+
+def _folded(keyword: str) -> str:
+    return " ".join(keyword.lower().split())
+
+
+class _Entry:
+    __slots__ = ("value", "size", "stored_at", "keyword")
+
+    def __init__(self, value: Dict[str, Any], size: int, stored_at: float, keyword: str):
+        self.value = value
+        self.size = size
+        self.stored_at = stored_at
+        self.keyword = keyword  # what was actually researched
+
+
+class ResearchCache:
+    def __init__(
+        self,
+        loader: Loader,
+        ttl: float = RESEARCH_CACHE_TTL,
+        stale_ttl: float = RESEARCH_CACHE_STALE_TTL,
+        max_entries: int = RESEARCH_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESEARCH_CACHE_MAX_BYTES,
+    ):
+        self._loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.index = KeywordIndex()  # mirrors the keys of _entries
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshes: set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.reused = {"canonical": 0, "similar": 0}
+
+    # --- public API ---
+
+    async def get(self, keyword: str) -> Tuple[Dict[str, Any], str]:
+        """Return (result, status) for a keyword, loading it on a miss."""
+        value, status, _ = await self.get_with_match(keyword)
+        return value, status
+
+    async def get_with_match(self, keyword: str) -> Tuple[Dict[str, Any], str, Dict[str, Any]]:
+        """
+        Like `get`, plus how the keyword was matched:
+        {"key", "similarity", "reusedFrom"} — `reusedFrom` is the keyword the served
+        research was done for, when it differs from this one beyond case and spacing.
+        """
+        key, similarity = self._resolve(keyword)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            age = now - entry.stored_at
+            if age <= self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                match = self._match(key, similarity, keyword, entry)
+                if age <= self.ttl:
+                    self.hits += 1
+                    return entry.value, HIT, match
+                self.stale_hits += 1
+                self._refresh_in_background(key, entry.keyword)
+                return entry.value, STALE, match
+            self._remove(key)
+            key = normalize_keyword(keyword)
+
+        self.misses += 1
+        return await self._load(key, keyword), MISS, {"key": key, "similarity": None, "reusedFrom": None}
+
+    async def load(self, keyword: str) -> Dict[str, Any]:
+        """Fetch and store a keyword regardless of what is cached (joins an in-flight fetch)."""
+        return await self._load(normalize_keyword(keyword), keyword)
+
+    def peek(self, keyword: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh or stale-servable entry without loading or touching LRU order."""
+        entry = self._entries.get(self._resolve(keyword)[0])
+        if entry is None or time.monotonic() - entry.stored_at > self.ttl + self.stale_ttl:
+            return None
+        return entry.value
+
+    def put(self, keyword: str, value: Dict[str, Any]) -> None:
+        self._store(normalize_keyword(keyword), value, keyword)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "reusedCanonical": self.reused["canonical"],
+            "reusedSimilar": self.reused["similar"],
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.index = KeywordIndex(self.index.threshold)
+        self._bytes = 0
+
+    # --- internals ---
+
+    def _resolve(self, keyword: str) -> Tuple[str, float]:
+        """(cache key, similarity): the canonical key, or the closest researched key above the threshold."""
+        key = normalize_keyword(keyword)
+        if key in self._entries:
+            return key, 1.0
+        match = self.index.match(keyword)
+        return match if match is not None else (key, 0.0)
+
+    def _match(self, key: str, similarity: float, keyword: str, entry: _Entry) -> Dict[str, Any]:
+        reused_from = None
+        if _folded(entry.keyword) != _folded(keyword):
+            reused_from = entry.keyword
+            kind = "canonical" if similarity >= 1.0 else "similar"
+            self.reused[kind] += 1
+            RESEARCH_KEYWORD_REUSE.inc(kind)
+        return {"key": key, "similarity": round(similarity, 3), "reusedFrom": reused_from}
+
+    async def _load(self, key: str, keyword: str) -> Dict[str, Any]:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_and_store(key, keyword))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _f, k=key: self._inflight.pop(k, None))
+        # Shield so one cancelled caller doesn't cancel the shared upstream call
+        return await asyncio.shield(future)
+
+    async def _fetch_and_store(self, key: str, keyword: str) -> Dict[str, Any]:
+        value = await self._loader(keyword)
+        self._store(key, value, keyword)
+        return value
+
+    def _refresh_in_background(self, key: str, keyword: str) -> None:
+        if key in self._inflight:
+            return
+        task = asyncio.ensure_future(self._load(key, keyword))
+        self._refreshes.add(task)
+
+        def _done(t: asyncio.Task) -> None:
+            self._refreshes.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                # Keep serving the stale entry; the next request will retry
+                print(f"Research cache refresh failed for '{key}': {t.exception()}")
+
+        task.add_done_callback(_done)
+
+    def _store(self, key: str, value: Dict[str, Any], keyword: str) -> None:
+        size = len(json.dumps(value, ensure_ascii=False, default=str))
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = _Entry(value, size, time.monotonic(), keyword)
+        self.index.add(key)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.index.discard(key)
+            self._bytes -= entry.size
+
+
+research_cache = ResearchCache(loader=research_topic)
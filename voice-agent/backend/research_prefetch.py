@@ -0,0 +1,152 @@
+"""
+Research prefetch — warms the research cache for upcoming trending keywords.
+
+The frontend knows the trending list before a user clicks a topic. It posts the
+keywords here; a small pool of background workers researches the top N under a
+concurrency limit and a per-minute rate budget, storing results in
+`research_cache` so `/api/research` can answer instantly.
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+from research_cache import HIT, MISS, STALE, ResearchCache, normalize_keyword, research_cache
+
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_RATE_PER_MINUTE = float(os.getenv("PREFETCH_RATE_PER_MINUTE", "10"))
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "5"))
+PREFETCH_QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE_SIZE", "100"))
+
+
+class RateBudget:
+    """Token bucket: `rate_per_minute` calls on average, bursting up to `burst`."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, rate_per_minute / 6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, cost: float = 1) -> float:
+        """Take `cost` tokens if available. Returns 0, or the seconds until they will be."""
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ResearchPrefetcher:
+    def __init__(
+        self,
+        cache: ResearchCache,
+        concurrency: int = PREFETCH_CONCURRENCY,
+        rate_per_minute: float = PREFETCH_RATE_PER_MINUTE,
+        queue_size: int = PREFETCH_QUEUE_SIZE,
+    ):
+        self.cache = cache
+        self.concurrency = max(1, concurrency)
+        self.budget = RateBudget(rate_per_minute)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._queued: set[str] = set()
+        self._prefetched: set[str] = set()
+        self._workers: list[asyncio.Task] = []
+
+        self.completed = 0
+        self.failed = 0
+        self.hits = 0  # /api/research served from a prefetched entry
+        self.misses = 0  # /api/research had to go upstream
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # --- public API ---
+
+    def submit(self, keywords: list[str], top_n: int = PREFETCH_TOP_N) -> dict:
+        """Queue up to `top_n` keywords (in the given order) that aren't cached or queued yet."""
+        accepted, skipped = [], []
+        for keyword in keywords[:max(top_n, 0)]:
+            key = normalize_keyword(keyword)
+            if not key or key in self._queued or self.cache.peek(key) is not None:
+                skipped.append(keyword)
+                continue
+            try:
+                self._queue.put_nowait(keyword)
+            except asyncio.QueueFull:
+                skipped.append(keyword)
+                continue
+            self._queued.add(key)
+            accepted.append(keyword)
+        return {"accepted": accepted, "skipped": skipped, "queued": self._queue.qsize()}
+
+    def record_lookup(self, keyword: str, cache_status: str) -> None:
+        """Count whether an on-demand research request was answered by prefetched data."""
+        key = normalize_keyword(keyword)
+        if cache_status in (HIT, STALE) and key in self._prefetched:
+            self.hits += 1
+        elif cache_status == MISS:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "queued": self._queue.qsize(),
+            "workers": len(self._workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    # --- internals ---
+
+    async def _worker(self) -> None:
+        while True:
+            keyword = await self._queue.get()
+            key = normalize_keyword(keyword)
+            try:
+                # Someone may have researched it on demand while it sat in the queue
+                if self.cache.peek(key) is None:
+                    await self.budget.acquire()
+                    await self.cache.load(keyword)
+                self._prefetched.add(key)
+                if len(self._prefetched) > self.cache.max_entries:
+                    # Forget keys the cache has already evicted
+                    self._prefetched = {k for k in self._prefetched if self.cache.peek(k) is not None}
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                print(f"Research prefetch failed for '{keyword}': {e}")
+            finally:
+                self._queued.discard(key)
+                self._queue.task_done()
+
+
+research_prefetcher = ResearchPrefetcher(research_cache)
@@ -0,0 +1,133 @@
+"""
+Production entry point: `python serve.py`.
+
+Runs WEB_CONCURRENCY worker processes (default 1) on uvloop and httptools,
+without the file-watching reloader that `python main.py` uses. Live sessions,
+the research cache and admission limits are per process, so scale out with more
+single-worker instances behind sticky routing rather than more workers.
+
+Each worker reports readiness at GET /ready: 503 while starting, while the
+optional warm-up (STARTUP_WARMUP) runs, and once a drain has begun. On SIGTERM
+a worker flips /ready to 503, waits SHUTDOWN_GRACE_DELAY seconds so load
+balancers stop routing to it, then stops accepting connections. In-flight
+requests (LLM generations and SSE streams included) and running jobs then get
+until SHUTDOWN_DRAIN_SECONDS after the signal to finish. Anything still running
+after that is cancelled, and interrupted jobs are requeued.
+"""
+import asyncio
+import importlib.util
+import os
+import signal
+import threading
+import time
+from typing import Callable, Optional
+
+import uvicorn
+
+import startup
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Long enough for a full generation: the OpenAI deadline is 45 s
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "60"))
+SHUTDOWN_GRACE_DELAY = float(os.getenv("SHUTDOWN_GRACE_DELAY", "0"))
+DRAIN_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+_drain_started: Optional[float] = None
+_drain_callbacks: list[Callable[[], None]] = []
+
+
+def on_drain(callback: Callable[[], None]) -> None:
+    """Call `callback` as soon as a drain starts (e.g. stop picking up queued jobs)."""
+    _drain_callbacks.append(callback)
+
+
+def draining() -> bool:
+    return _drain_started is not None
+
+
+def drain_remaining() -> float:
+    """Seconds left of the drain budget; 0 when no drain was signalled (plain shutdown)."""
+    if _drain_started is None:
+        return 0.0
+    return max(0.0, SHUTDOWN_DRAIN_SECONDS - (time.monotonic() - _drain_started))
+
+
+def begin_drain() -> None:
+    global _drain_started
+    if _drain_started is not None:
+        return
+    _drain_started = time.monotonic()
+    print(f"Draining: not ready, finishing in-flight work (up to {SHUTDOWN_DRAIN_SECONDS:.0f}s)")
+    for callback in _drain_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"Drain callback failed: {e}")
+
+
+def install_drain_handler() -> None:
+    """
+    Wrap the server's SIGTERM/SIGINT handlers so a signal starts the drain first.
+    Call from the lifespan, after uvicorn has installed its handlers.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return  # e.g. under TestClient; signals can only be handled on the main thread
+    loop = asyncio.get_running_loop()
+    for sig in DRAIN_SIGNALS:
+        original = signal.getsignal(sig)
+        if not callable(original):
+            continue
+
+        def handler(signum, frame, original=original):
+            if draining():
+                original(signum, frame)  # second signal: hand over at once
+                return
+            begin_drain()
+            # uvicorn closes its listening socket as soon as it sees the signal
+            if SHUTDOWN_GRACE_DELAY > 0:
+                loop.call_later(SHUTDOWN_GRACE_DELAY, original, signum, frame)
+            else:
+                original(signum, frame)
+
+        signal.signal(sig, handler)
+
+
+def readiness() -> tuple[bool, str]:
+    """(ready, status): status is starting, warming, draining or ready."""
+    if draining():
+        return False, "draining"
+    if not startup.has_started():
+        return False, "starting"
+    if startup.warmup_status() in ("pending", "running"):
+        return False, "warming"
+    return True, "ready"
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main() -> None:
+    if WEB_CONCURRENCY > 1:
+        print(
+            f"WEB_CONCURRENCY={WEB_CONCURRENCY}: sessions, the research cache and admission limits "
+            "are per worker; /sessions calls that land on another worker will 404"
+        )
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=max(1, WEB_CONCURRENCY),
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        # Budget for in-flight requests once the signal reaches uvicorn
+        timeout_graceful_shutdown=max(1, int(SHUTDOWN_DRAIN_SECONDS - SHUTDOWN_GRACE_DELAY)),
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Live transcript sessions — incremental ingestion during an interview.
+
+The client opens a session, appends ConversationText messages in small batches
+while the call runs, and finalizes at the end. Each message is formatted once on
+arrival (O(delta) per append), so finalizing only joins lines that already exist.
+
+Sessions live in memory in LRU order: idle sessions are evicted after
+SESSION_IDLE_TIMEOUT seconds and the store never holds more than SESSION_MAX_SESSIONS.
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from transcript_processor import format_message, transcript_result
+
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "1800"))  # 30 min
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "5000"))
+
+
+class SessionLimitError(Exception):
+    """Raised when an append would push a session over SESSION_MAX_MESSAGES."""
+
+
+class SessionGapError(Exception):
+    """Raised when a batch starts past the end of the conversation received so far."""
+
+    def __init__(self, expected_offset: int):
+        super().__init__(f"Messages are missing: next offset must be {expected_offset}")
+        self.expected_offset = expected_offset
+
+
+class TranscriptSession:
+    def __init__(self, session_id: str, topic: str, user_name: str, speculative: bool = False, user_key: str = "anonymous"):
+        self.id = session_id
+        self.topic = topic
+        self.user_name = user_name
+        self.user_key = user_key  # admission identity of the caller that opened the session
+        self.lines: list[str] = []
+        self.message_count = 0  # raw messages received, including empty ones
+        self.user_turns = 0
+        self.user_chars = 0
+        # Speculative draft state (see draft_speculator)
+        self.speculative = speculative
+        self.draft: Optional[dict] = None
+        self.draft_task: Optional[asyncio.Task] = None
+        self.drafts_started = 0
+        self.draft_user_turns = 0
+        self.draft_user_chars = 0
+        self.finalized = False
+        self.duration = 0
+        self.created_at = time.monotonic()
+        self.last_seen = self.created_at
+
+    def append(self, messages: list[dict], offset: Optional[int] = None) -> int:
+        """
+        Append a batch of raw messages and return how many were new.
+
+        `offset` is the index of the first message in the batch within the whole
+        conversation. Messages already received are skipped, so a client can
+        safely resend a batch after a dropped request. A batch that starts past
+        the end raises SessionGapError instead of leaving a hole.
+        """
+        if offset is not None:
+            if offset > self.message_count:
+                raise SessionGapError(self.message_count)
+            skip = self.message_count - offset
+            if skip > 0:
+                messages = messages[skip:]
+        if self.message_count + len(messages) > SESSION_MAX_MESSAGES:
+            raise SessionLimitError(f"Session exceeds {SESSION_MAX_MESSAGES} messages")
+
+        for m in messages:
+            line = format_message(m, self.user_name)
+            if line is not None:
+                self.lines.append(line)
+                if m.get("role") == "user":
+                    self.user_turns += 1
+                    self.user_chars += len(line)
+        self.message_count += len(messages)
+        return len(messages)
+
+    def transcript_text(self) -> str:
+        return "\n\n".join(self.lines)
+
+    def result(self) -> dict:
+        """Same shape as the /transcript response."""
+        data = transcript_result(self.topic, self.user_name, self.transcript_text(), self.duration)
+        data["sessionId"] = self.id
+        data["messageCount"] = self.message_count
+        data["finalized"] = self.finalized
+        return data
+
+
+class SessionStore:
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        idle_timeout: float = SESSION_IDLE_TIMEOUT,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: "OrderedDict[str, TranscriptSession]" = OrderedDict()
+
+    def create(self, topic: str, user_name: str, speculative: bool = False, user_key: str = "anonymous") -> TranscriptSession:
+        self.evict_idle()
+        session = TranscriptSession(uuid.uuid4().hex, topic, user_name, speculative, user_key)
+        self._sessions[session.id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[TranscriptSession]:
+        """Return a live session and mark it as recently used."""
+        self.evict_idle()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_seen = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def remove(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def evict_idle(self) -> int:
+        """Drop sessions idle longer than idle_timeout. Oldest-first, so this stops at the first live one."""
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = 0
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_seen >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+session_store = SessionStore()
@@ -0,0 +1,149 @@
+"""
+Cold-start instrumentation and the optional warm-up hook.
+
+`begin()` runs before main.py imports anything else and times every import
+that follows, attributing each one's self time to its top-level package
+(fastapi, openai, agent_config, ...). The lifespan then times its init phases
+with `phase()`. The result is printed once the app starts and served at
+GET /startup.
+
+Heavy dependencies (openai, langgraph) are imported lazily on first use. With
+STARTUP_WARMUP=1 they are loaded by `warmup()` in the background right after
+startup, so the port opens at once and the first real request doesn't pay for them.
+"""
+import asyncio
+import builtins
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+STARTUP_REPORT_TOP = 12  # packages listed in the report, slowest first
+
+_started_at: Optional[float] = None
+_ready_at: Optional[float] = None
+_phases: dict[str, float] = {}
+_warmup_steps: list[tuple[str, Callable[[], object]]] = []
+_warmup = {"status": "disabled", "seconds": None, "steps": {}, "errors": {}}
+
+
+class ImportTimer:
+    """Wraps builtins.__import__ and accumulates import self time per top-level package."""
+
+    def __init__(self):
+        self.self_seconds: defaultdict = defaultdict(float)
+        self.total = 0.0
+        self._stack: list[float] = []  # time spent in nested imports, per open frame
+        self._original = None
+
+    def install(self) -> None:
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Already-loaded modules cost nothing; relative imports stay within (and count toward) the caller's package
+        if level or name in sys.modules:
+            return self._original(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            self.self_seconds[name.partition(".")[0]] += elapsed - nested
+            if self._stack:
+                self._stack[-1] += elapsed
+            else:
+                self.total += elapsed
+
+
+import_timer = ImportTimer()
+
+
+def begin() -> None:
+    """Start the clock and time imports from here on. Call before any other import in main.py."""
+    global _started_at
+    if _started_at is None:
+        _started_at = time.perf_counter()
+        import_timer.install()
+
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = time.perf_counter() - start
+
+
+def register_warmup(name: str, step: Callable[[], object]) -> None:
+    """Add a blocking warm-up step (run in a worker thread by `warmup`)."""
+    _warmup_steps.append((name, step))
+
+
+def started() -> None:
+    """The lifespan finished starting up: stop timing imports and print the report."""
+    global _ready_at
+    import_timer.uninstall()
+    _ready_at = time.perf_counter()
+    if STARTUP_WARMUP:
+        _warmup["status"] = "pending"
+    print(f"Startup: {summary()}")
+
+
+async def warmup() -> None:
+    """Run the registered warm-up steps in order. Failures are logged and skipped."""
+    _warmup["status"] = "running"
+    start = time.perf_counter()
+    for name, step in _warmup_steps:
+        step_start = time.perf_counter()
+        try:
+            await asyncio.to_thread(step)
+        except Exception as e:
+            print(f"Warm-up step '{name}' failed: {e}")
+            _warmup["errors"][name] = str(e)
+        _warmup["steps"][name] = round(time.perf_counter() - step_start, 4)
+    _warmup["seconds"] = round(time.perf_counter() - start, 4)
+    _warmup["status"] = "done"
+    print(f"Warm-up finished in {_warmup['seconds']:.2f}s: {_warmup['steps']}")
+
+
+def warmup_status() -> str:
+    return _warmup["status"]
+
+
+def has_started() -> bool:
+    return _ready_at is not None
+
+
+def summary() -> str:
+    data = report()
+    slowest = ", ".join(f"{m['module']} {m['seconds']:.2f}s" for m in data["imports"]["modules"][:5])
+    phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in data["phases"].items())
+    return f"ready in {data['totalSeconds']:.2f}s; imports {data['imports']['seconds']:.2f}s ({slowest}); {phases}"
+
+
+def report() -> dict:
+    modules = sorted(import_timer.self_seconds.items(), key=lambda item: item[1], reverse=True)
+    end = _ready_at if _ready_at is not None else time.perf_counter()
+    return {
+        "totalSeconds": round(end - (_started_at or end), 4),
+        "imports": {
+            "seconds": round(import_timer.total, 4),
+            "modules": [{"module": name, "seconds": round(seconds, 4)} for name, seconds in modules[:STARTUP_REPORT_TOP]],
+        },
+        "phases": {name: round(seconds, 4) for name, seconds in _phases.items()},
+        "lazy": {name: name in sys.modules for name in ("openai", "langgraph")},
+        "warmup": dict(_warmup),
+    }
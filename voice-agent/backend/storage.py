@@ -0,0 +1,23 @@
+"""
+Local SQLite plumbing shared by the job and artifact stores.
+
+Databases live under DATA_DIR and run in WAL mode, so readers never block the
+writer and several worker processes can share one file.
+"""
+import os
+import sqlite3
+
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+
+def open_sqlite(path: str, schema: str) -> sqlite3.Connection:
+    """Open (creating if needed) a WAL-mode database and apply `schema`."""
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Autocommit; statements are single-row and run on the event loop thread
+    db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(schema)
+    return db
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Run from backend/ or the repo root: the modules under test are flat files in backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep SQLite stores out of backend/data
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="podcast-studio-tests-"))
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def controller(**kwargs) -> AdmissionController:
+    options = dict(max_concurrency=1, queue_size=16, max_wait=5, rate_per_minute=600, burst=10)
+    options.update(kwargs)
+    return AdmissionController("test", **options)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_freed_slots_go_to_users_round_robin():
+    async def scenario():
+        admission = controller()
+        holder = await admission.acquire("holder")
+        granted = []
+
+        async def wait_for_slot(user):
+            ticket = await admission.acquire(user)
+            granted.append(user)
+            return ticket
+
+        # alice queues three requests before bob's one
+        waiters = [asyncio.ensure_future(wait_for_slot(user)) for user in ("alice", "alice", "alice", "bob")]
+        await _settle()
+        assert admission.queued == 4 and admission.stats()["waitingUsers"] == 2
+
+        holder.release()
+        for _ in waiters:
+            await _settle()
+            ticket = next(w.result() for w in waiters if w.done() and not w.result().released)
+            ticket.release()
+        await _settle()
+        return admission, granted
+
+    admission, granted = asyncio.run(scenario())
+    assert granted == ["alice", "bob", "alice", "alice"]
+    assert admission.active == 0 and admission.queued == 0
+
+
+def test_queue_timeout_leaves_no_waiter_behind():
+    async def scenario():
+        admission = controller(max_wait=0.05)
+        holder = await admission.acquire("holder")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("alice")
+        assert rejected.value.reason == "queue_timeout"
+        assert admission.queued == 0
+        holder.release()
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.active == 0
+
+
+def test_cancelled_waiter_granted_a_slot_hands_it_on():
+    async def scenario():
+        admission = controller()
+        holder = await admission.acquire("holder")
+        alice = asyncio.ensure_future(admission.acquire("alice"))
+        bob = asyncio.ensure_future(admission.acquire("bob"))
+        await _settle()
+
+        holder.release()  # grants alice's slot...
+        alice.cancel()  # ...but alice gives up before she sees it
+        await _settle()
+        assert alice.cancelled()
+        assert bob.done() and admission.active == 1
+        bob.result().release()
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.active == 0 and admission.queued == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        admission = controller()
+        holder = await admission.acquire("holder")
+        alice = asyncio.ensure_future(admission.acquire("alice"))
+        await _settle()
+        alice.cancel()
+        await _settle()
+        assert admission.queued == 0 and admission.stats()["waitingUsers"] == 0
+        holder.release()
+        return admission
+
+    assert asyncio.run(scenario()).active == 0
+
+
+def test_batch_charge_is_all_or_nothing():
+    admission = controller(rate_per_minute=1, burst=5)
+    admission.charge("alice", 3)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.charge("alice", 3)
+    assert rejected.value.reason == "user_rate"
+    admission.charge("alice", 2)  # the rejected charge took nothing
+
+
+def test_charge_larger_than_the_burst_is_rejected():
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller(burst=5).charge("alice", 6)
+    assert rejected.value.reason == "over_burst"
@@ -0,0 +1,56 @@
+from artifact_store import POST, TRANSCRIPT, ArtifactStore
+
+
+def make_store(tmp_path) -> ArtifactStore:
+    store = ArtifactStore(str(tmp_path / "artifacts.sqlite3"))
+    store.open()
+    return store
+
+
+def test_same_content_is_one_body_with_a_link_per_owner(tmp_path):
+    store = make_store(tmp_path)
+    first = store.put(TRANSCRIPT, "same words", user_key="u:alice", session_id="s1")
+    second = store.put(TRANSCRIPT, "same words", user_key="u:bob", session_id="s2")
+    again = store.put(TRANSCRIPT, "same words", user_key="u:alice", session_id="s1")
+
+    assert first == second == again
+    assert store.db.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0] == 1
+    artifact = store.get(first, "u:alice")
+    assert [(l["userKey"], l["sessionId"]) for l in artifact["links"]] == [("u:alice", "s1")]
+    assert artifact["body"] == "same words"
+    assert [l["userKey"] for l in store.get(first, "u:bob")["links"]] == ["u:bob"]
+
+
+def test_each_owner_sees_it_in_their_own_history(tmp_path):
+    store = make_store(tmp_path)
+    transcript = store.put(TRANSCRIPT, "shared", user_key="u:alice")
+    store.put(TRANSCRIPT, "shared", user_key="u:bob", session_id="s2")
+    post = store.put(POST, {"linkedin": "post"}, user_key="u:bob", parent_id=transcript, meta={"template": "t"})
+
+    assert [a["id"] for a in store.list("u:alice")] == [transcript]
+    bob = store.list("u:bob")
+    assert [a["id"] for a in bob] == [post, transcript]
+    assert bob[0]["meta"] == {"template": "t"} and bob[1]["sessionId"] == "s2"
+    assert [a["id"] for a in store.list("u:bob", session_id="s2")] == [transcript]
+    assert [a["id"] for a in store.list("u:bob", parent_id=transcript)] == [post]
+    assert store.list("u:alice", kind=POST) == []
+
+
+def test_other_users_artifacts_are_invisible(tmp_path):
+    store = make_store(tmp_path)
+    transcript = store.put(TRANSCRIPT, "alice's words", user_key="u:alice", session_id="s1")
+    store.put(POST, {"linkedin": "post"}, user_key="u:alice", parent_id=transcript)
+
+    assert store.list("u:eve", parent_id=transcript) == []
+    assert store.list("u:eve", session_id="s1") == []
+    assert store.get(transcript, "u:eve") is None
+    assert store.get_transcript(transcript, "u:eve") is None
+    assert store.get_transcript(transcript, "u:alice") == "alice's words"
+
+
+def test_null_owner_fields_do_not_duplicate_links(tmp_path):
+    store = make_store(tmp_path)
+    store.put(TRANSCRIPT, "guest words", user_key="ip:1.2.3.4")
+    artifact_id = store.put(TRANSCRIPT, "guest words", user_key="ip:1.2.3.4")
+    assert len(store.get(artifact_id, "ip:1.2.3.4")["links"]) == 1
+    assert store.get(artifact_id, "ip:1.2.3.4", kind=POST) is None
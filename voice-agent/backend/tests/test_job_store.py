@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from job_store import QUEUED, RUNNING, SUCCEEDED, IdempotencyConflict, JobRunner, JobStore
+
+
+def make_store(tmp_path) -> JobStore:
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.open()
+    return store
+
+
+def test_idempotency_key_returns_the_same_job_for_the_same_user(tmp_path):
+    store = make_store(tmp_path)
+    job, created = store.create("research", {"keyword": "ai"}, "u:alice", "key-1")
+    again, created_again = store.create("research", {"keyword": "ai"}, "u:alice", "key-1")
+    assert created and not created_again
+    assert again["jobId"] == job["jobId"]
+
+
+def test_idempotency_keys_are_scoped_per_user(tmp_path):
+    store = make_store(tmp_path)
+    alice, _ = store.create("research", {"keyword": "ai"}, "u:alice", "key-1")
+    bob, created = store.create("research", {"keyword": "robots"}, "u:bob", "key-1")
+    assert created and bob["jobId"] != alice["jobId"]
+
+
+def test_same_key_with_a_different_body_conflicts(tmp_path):
+    store = make_store(tmp_path)
+    store.create("research", {"keyword": "ai"}, "u:alice", "key-1")
+    with pytest.raises(IdempotencyConflict):
+        store.create("research", {"keyword": "robots"}, "u:alice", "key-1")
+
+
+def test_a_job_is_claimed_once_and_requeued_after_an_interruption(tmp_path):
+    store = make_store(tmp_path)
+    job, _ = store.create("research", {"keyword": "ai"}, "u:alice")
+    assert store.claim(job["jobId"]) is not None
+    assert store.claim(job["jobId"]) is None  # another worker lost the race
+    assert store.get(job["jobId"])["status"] == RUNNING
+
+    store.requeue(job["jobId"])
+    assert store.get(job["jobId"])["status"] == QUEUED
+    assert store.recover() == [job["jobId"]]
+    assert store.claim(job["jobId"]) is not None
+
+
+def test_runner_passes_the_submitting_user_to_the_handler(tmp_path):
+    seen = []
+
+    async def handler(request, user_key):
+        seen.append((request, user_key))
+        return {"ok": True}
+
+    async def scenario():
+        runner = JobRunner(make_store(tmp_path), workers=1)
+        runner.register("echo", "openai", handler)
+        runner.start()
+        job, _ = runner.submit("echo", {"value": 1}, "u:alice")
+        finished = await runner.wait(job["jobId"], 5)
+        await runner.stop()
+        return finished
+
+    finished = asyncio.run(scenario())
+    assert finished["status"] == SUCCEEDED and finished["result"] == {"ok": True}
+    assert seen == [({"value": 1}, "u:alice")]
+
+
+def test_recovered_jobs_beyond_the_queue_size_still_run(tmp_path):
+    store = make_store(tmp_path)
+    job_ids = [store.create("echo", {"value": i}, "u:alice")[0]["jobId"] for i in range(5)]
+
+    async def handler(request, user_key):
+        return request
+
+    async def scenario():
+        runner = JobRunner(store, workers=1, queue_size=2)
+        runner.register("echo", "openai", handler)
+        runner.start()
+        finished = [await runner.wait(job_id, 5) for job_id in job_ids]
+        await runner.stop()
+        return finished
+
+    assert [job["status"] for job in asyncio.run(scenario())] == [SUCCEEDED] * 5
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from perplexity_service import KeywordIndex, canonical_keyword
+from research_cache import HIT, ResearchCache
+from research_prefetch import ResearchPrefetcher
+
+
+def test_word_order_case_and_plurals_share_a_key():
+    assert canonical_keyword("AI agents debugging") == "agent ai debugging"
+    assert canonical_keyword("debugging AI agents") == "agent ai debugging"
+    assert canonical_keyword("  AI Agent Debugging ") == "agent ai debugging"
+    assert canonical_keyword("startup companies") == "company startup"
+
+
+def test_words_ending_in_s_that_are_not_plurals():
+    assert canonical_keyword("news") == "news"
+    assert canonical_keyword("AI news") == "ai news"
+    assert canonical_keyword("sports analytics") == "analytics sport"
+    assert canonical_keyword("Kubernetes") == "kubernetes"
+    assert canonical_keyword("class") == "class"
+
+
+def test_capitalised_stop_words_are_acronyms():
+    assert canonical_keyword("IT jobs") == "IT job"
+    assert canonical_keyword("it jobs") == "job"
+    assert canonical_keyword("WHO guidelines") == "guideline WHO"
+    assert canonical_keyword("A guide to IT") == "guide IT"
+    assert canonical_keyword("IT in 2025") == "2025 IT"
+    # An all-caps keyword is shouting, not a list of acronyms
+    assert canonical_keyword("HOW TO USE AI") == canonical_keyword("how to use ai")
+
+
+def test_stop_word_only_keyword_keeps_its_words():
+    assert canonical_keyword("the who") == "the who"
+
+
+def test_index_matches_similar_keys_only():
+    index = KeywordIndex(threshold=0.6)
+    index.add(canonical_keyword("AI agents debugging tools"))
+    match = index.match("debugging tools for AI agents")
+    assert match is not None and match[0] == "agent ai debugging tool"
+    assert index.match("IT jobs") is None
+    assert index.match("news") is None
+
+
+@pytest.mark.parametrize("keyword", [
+    "AI agents debugging", "IT jobs", "it jobs", "WHO guidelines", "IT in 2025", "A guide to IT",
+    "HOW TO USE AI", "the who", "THE WHO", "news", "startup companies", "  ", "C++ vs C#",
+])
+def test_canonical_keys_are_their_own_canonical_form(keyword):
+    key = canonical_keyword(keyword)
+    assert canonical_keyword(key) == key
+
+
+def test_prefetcher_skips_and_counts_acronym_keywords_already_cached():
+    async def load(keyword):
+        return {"title": keyword}
+
+    async def scenario():
+        cache = ResearchCache(load, ttl=60)
+        prefetcher = ResearchPrefetcher(cache)
+        prefetcher._prefetched.add(canonical_keyword("IT jobs"))
+        await cache.get("IT jobs")
+        assert prefetcher.submit(["IT jobs"])["skipped"] == ["IT jobs"]
+        _, status, match = await cache.get_with_match("IT jobs")
+        prefetcher.record_lookup(match["key"], status)
+        return status, prefetcher.hits
+
+    assert asyncio.run(scenario()) == (HIT, 1)
@@ -0,0 +1,105 @@
+import asyncio
+
+from research_cache import HIT, MISS, STALE, ResearchCache
+
+
+class Loader:
+    """Counts calls; each call waits for `release` when one is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = None
+        self.fail = False
+
+    async def __call__(self, keyword):
+        self.calls.append(keyword)
+        if self.release is not None:
+            await self.release.wait()
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {"title": keyword, "version": len(self.calls)}
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    async def scenario():
+        loader = Loader()
+        loader.release = asyncio.Event()
+        cache = ResearchCache(loader)
+        callers = [asyncio.ensure_future(cache.get(k)) for k in ("AI agents", "agents AI", "ai agent", "AI Agents")]
+        await _settle()
+        loader.release.set()
+        return loader, await asyncio.gather(*callers)
+
+    loader, results = asyncio.run(scenario())
+    assert loader.calls == ["AI agents"]
+    assert {result["version"] for result, _ in results} == {1}
+    assert {status for _, status in results} == {MISS}
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_fetch():
+    async def scenario():
+        loader = Loader()
+        loader.release = asyncio.Event()
+        cache = ResearchCache(loader)
+        first = asyncio.ensure_future(cache.get("robots"))
+        second = asyncio.ensure_future(cache.get("robots"))
+        await _settle()
+        first.cancel()
+        loader.release.set()
+        result, _ = await second
+        return loader, cache, result
+
+    loader, cache, result = asyncio.run(scenario())
+    assert len(loader.calls) == 1 and result["version"] == 1
+    assert cache.peek("robots") == result
+
+
+def test_stale_entries_are_served_while_one_refresh_runs():
+    async def scenario():
+        loader = Loader()
+        cache = ResearchCache(loader, ttl=0, stale_ttl=60)
+        first, status = await cache.get("robots")
+        assert status == MISS
+
+        loader.release = asyncio.Event()
+        stale = [await cache.get("robots") for _ in range(3)]
+        assert [status for _, status in stale] == [STALE] * 3
+        assert {value["version"] for value, _ in stale} == {1}
+        await _settle()
+        assert len(loader.calls) == 2  # one background refresh for all three stale hits
+
+        loader.release.set()
+        await _settle()
+        refreshed, status = await cache.get("robots")
+        return refreshed, status
+
+    refreshed, status = asyncio.run(scenario())
+    assert refreshed["version"] == 2 and status == STALE
+
+
+def test_failed_refresh_keeps_the_stale_entry():
+    async def scenario():
+        loader = Loader()
+        cache = ResearchCache(loader, ttl=0, stale_ttl=60)
+        await cache.get("robots")
+        loader.fail = True
+        await cache.get("robots")
+        await _settle()
+        return await cache.get("robots")
+
+    value, status = asyncio.run(scenario())
+    assert status == STALE and value["version"] == 1
+
+
+def test_fresh_entries_are_hits():
+    async def scenario():
+        cache = ResearchCache(Loader(), ttl=60)
+        await cache.get("robots")
+        return await cache.get("Robots ")
+
+    assert asyncio.run(scenario())[1] == HIT
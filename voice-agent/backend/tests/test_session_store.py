@@ -0,0 +1,23 @@
+import pytest
+
+from session_store import SessionGapError, TranscriptSession
+
+
+def messages(*texts):
+    return [{"role": "user", "content": text} for text in texts]
+
+
+def test_resent_batches_are_not_appended_twice():
+    session = TranscriptSession("s1", "AI", "Sam")
+    assert session.append(messages("one", "two"), offset=0) == 2
+    assert session.append(messages("two", "three"), offset=1) == 1
+    assert session.message_count == 3
+
+
+def test_a_batch_past_the_end_is_rejected_with_the_expected_offset():
+    session = TranscriptSession("s1", "AI", "Sam")
+    session.append(messages("one", "two"), offset=0)
+    with pytest.raises(SessionGapError) as gap:
+        session.append(messages("five"), offset=4)
+    assert gap.value.expected_offset == 2
+    assert session.message_count == 2
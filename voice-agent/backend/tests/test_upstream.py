@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import upstream
+from upstream import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, call_upstream
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+def open_breaker(provider: str, model: str) -> CircuitBreaker:
+    breaker = upstream.get_breaker(provider, model)
+    breaker.reset_seconds = 0
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = CircuitBreaker("test", "probe", threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # everyone else fails fast while the probe runs
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow() and breaker.allow()
+
+
+def test_concurrent_calls_during_half_open_fail_fast():
+    open_breaker("test", "half-open-model")
+    release = asyncio.Event()
+    calls = []
+
+    async def attempt(model):
+        calls.append(model)
+        await release.wait()
+        return "ok"
+
+    async def scenario():
+        probe = asyncio.ensure_future(call_upstream("test", "op", attempt, ["half-open-model"], deadline=5))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await call_upstream("test", "op", attempt, ["half-open-model"], deadline=5)
+        release.set()
+        return await probe
+
+    assert asyncio.run(scenario()) == ("half-open-model", "ok")
+    assert calls == ["half-open-model"]
+    assert upstream.get_breaker("test", "half-open-model").state == CLOSED
+
+
+def test_probe_without_a_verdict_frees_the_slot():
+    breaker = open_breaker("test", "bad-request-model")
+
+    async def attempt(model):
+        raise BadRequest("caller error")
+
+    with pytest.raises(BadRequest):
+        asyncio.run(call_upstream("test", "op", attempt, ["bad-request-model"], deadline=5))
+    assert breaker.state == HALF_OPEN and breaker.allow()
+
+
+def test_latency_windows_are_kept_per_model():
+    async def attempt(model):
+        return model
+
+    asyncio.run(call_upstream("test", "latency", attempt, ["model-a"], deadline=5))
+    assert ("test", "latency", "model-a") in upstream._latencies
+    assert ("test", "latency", "model-b") not in upstream._latencies
@@ -0,0 +1,30 @@
+"""
+Token helpers — estimation and OpenAI usage accounting.
+
+We don't ship a tokenizer; ~4 characters per token is close enough for budgeting
+and routing decisions on English prompts (it errs slightly high, which is the safe side).
+"""
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of tokens in `text`."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def usage_to_dict(usage) -> dict:
+    """Flatten an OpenAI `usage` object into plain counters, splitting cached vs. uncached input."""
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "cached_prompt_tokens": cached,
+        "uncached_prompt_tokens": usage.prompt_tokens - cached,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
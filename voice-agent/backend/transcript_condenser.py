@@ -0,0 +1,145 @@
+"""
+Transcript condenser — map-reduce digest for long transcripts.
+
+Transcripts over CONDENSE_THRESHOLD_TOKENS are split on message boundaries into
+chunks, each chunk is reduced to its key stories, numbers and verbatim quotes in
+parallel (map), and the chunk digests are joined — and merged once more if still
+too long (reduce). Digests are cached by transcript hash so regenerations and
+batch variants of the same transcript reuse them.
+"""
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from clients import get_openai_client
+from metrics import record_token_usage
+from token_utils import estimate_tokens, usage_to_dict
+from upstream import call_upstream
+
+CONDENSE_THRESHOLD_TOKENS = int(os.getenv("CONDENSE_THRESHOLD_TOKENS", "6000"))
+CONDENSE_CHUNK_TOKENS = int(os.getenv("CONDENSE_CHUNK_TOKENS", "3000"))
+CONDENSE_CONCURRENCY = int(os.getenv("CONDENSE_CONCURRENCY", "4"))
+CONDENSE_CACHE_SIZE = int(os.getenv("CONDENSE_CACHE_SIZE", "64"))
+CONDENSE_MODEL = os.getenv("CONDENSE_MODEL", "gpt-4o-mini")
+
+DIGEST_HEADER = "[CONDENSED TRANSCRIPT DIGEST — key stories, numbers and verbatim quotes from a long interview]"
+
+MAP_PROMPT = """You are preparing source material for a LinkedIn ghostwriter.
+Below is PART {index} of {total} of a podcast interview transcript.
+
+Extract, as terse bullet points:
+- STORIES: concrete anecdotes or situations the speaker described (who, what happened, outcome)
+- NUMBERS: every specific figure, price, duration, metric or count, with its context
+- QUOTES: the most vivid lines, copied VERBATIM with the speaker's name
+- INSIGHTS: lessons, opinions or contrarian takes the speaker stated
+
+Only include what is in the transcript. Do not add commentary.
+
+TRANSCRIPT PART {index}/{total}:
+{chunk}"""
+
+REDUCE_PROMPT = """Merge these partial notes from one podcast interview into a single digest.
+Keep every specific number and every verbatim quote. Drop duplicates. Keep the
+STORIES / NUMBERS / QUOTES / INSIGHTS sections.
+
+NOTES:
+{notes}"""
+
+_digest_cache: "OrderedDict[str, str]" = OrderedDict()
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def split_transcript(transcript: str, chunk_tokens: int = CONDENSE_CHUNK_TOKENS) -> list[str]:
+    """Split on message boundaries (blank lines) into chunks of at most ~chunk_tokens."""
+    max_chars = chunk_tokens * 4
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for message in transcript.split("\n\n"):
+        # A single oversized message is cut into pieces on its own
+        pieces = [message[i:i + max_chars] for i in range(0, len(message), max_chars)] or [""]
+        for piece in pieces:
+            if current and size + len(piece) > max_chars:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+async def _complete(prompt: str) -> str:
+    client = get_openai_client()
+    model, completion = await call_upstream(
+        "openai",
+        "condense",
+        lambda model: client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            max_tokens=800,
+        ),
+        [CONDENSE_MODEL],
+    )
+    record_token_usage("openai", model, usage_to_dict(completion.usage))
+    return (completion.choices[0].message.content or "").strip()
+
+
+async def _condense(transcript: str) -> str:
+    chunks = split_transcript(transcript)
+    semaphore = asyncio.Semaphore(max(1, CONDENSE_CONCURRENCY))
+
+    async def _map(index: int, chunk: str) -> str:
+        async with semaphore:
+            return await _complete(MAP_PROMPT.format(index=index, total=len(chunks), chunk=chunk))
+
+    notes = await asyncio.gather(*[_map(i + 1, c) for i, c in enumerate(chunks)])
+    digest = "\n\n".join(f"PART {i + 1}/{len(chunks)}\n{n}" for i, n in enumerate(notes))
+
+    if estimate_tokens(digest) > CONDENSE_THRESHOLD_TOKENS:
+        digest = await _complete(REDUCE_PROMPT.format(notes=digest))
+
+    return f"{DIGEST_HEADER}\n\n{digest}"
+
+
+async def condense_transcript(transcript: str) -> Tuple[str, dict]:
+    """
+    Return (text_for_prompt, info). Short transcripts pass through unchanged.
+    info = {"condensed", "cached", "originalTokens", "promptTokens"}.
+    """
+    original_tokens = estimate_tokens(transcript)
+    if original_tokens <= CONDENSE_THRESHOLD_TOKENS:
+        return transcript, {
+            "condensed": False,
+            "cached": False,
+            "originalTokens": original_tokens,
+            "promptTokens": original_tokens,
+        }
+
+    key = hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+    digest = _digest_cache.get(key)
+    cached = digest is not None
+    if cached:
+        _digest_cache.move_to_end(key)
+    else:
+        # Single-flight: concurrent generations for the same transcript share one map-reduce
+        future = _inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(_condense(transcript))
+            _inflight[key] = future
+            future.add_done_callback(lambda _f: _inflight.pop(key, None))
+        digest = await asyncio.shield(future)
+        _digest_cache[key] = digest
+        _digest_cache.move_to_end(key)
+        while len(_digest_cache) > CONDENSE_CACHE_SIZE:
+            _digest_cache.popitem(last=False)
+
+    return digest, {
+        "condensed": True,
+        "cached": cached,
+        "originalTokens": original_tokens,
+        "promptTokens": estimate_tokens(digest),
+    }
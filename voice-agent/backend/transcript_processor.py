@@ -1,34 +1,50 @@
 """
 Transcript processor — formats and returns raw transcript only.
 """
+from typing import Optional
 
+AI_HOST_NAME = "Alex (AI Host)"
 
-def process_transcript(
-    topic: str,
-    user_name: str,
-    messages: list[dict],
-    duration: int,
-) -> dict:
-    lines = []
-    for m in messages:
-        role = m.get("role", "")
-        content = (m.get("content") or "").strip()
-        if not content:
-            continue
-        speaker = user_name if role == "user" else "Alex (AI Host)"
-        lines.append(f"{speaker}: {content}")
 
-    transcript_text = "\n\n".join(lines)
-    duration_str = f"{duration // 60} min {duration % 60} sec"
+def format_message(message: dict, user_name: str) -> Optional[str]:
+    """Format one conversation message as a transcript line, or None if it has no content."""
+    content = (message.get("content") or "").strip()
+    if not content:
+        return None
+    speaker = user_name if message.get("role", "") == "user" else AI_HOST_NAME
+    return f"{speaker}: {content}"
+
 
+def format_duration(duration: int) -> str:
+    return f"{duration // 60} min {duration % 60} sec"
+
+
+def transcript_result(topic: str, user_name: str, transcript_text: str, duration: int) -> dict:
     return {
         "success": True,
         "topic": topic,
         "userName": user_name,
-        "duration": duration_str,
+        "duration": format_duration(duration),
         "transcript": transcript_text,
         "content": {
             "linkedin": "",
             "twitter": "",
         },
     }
+
+
+def process_transcript(
+    topic: str,
+    user_name: str,
+    messages: list[dict],
+    duration: int,
+) -> dict:
+    lines = []
+    for m in messages:
+        line = format_message(m, user_name)
+        if line is not None:
+            lines.append(line)
+
+    transcript_text = "\n\n".join(lines)
+
+    return transcript_result(topic, user_name, transcript_text, duration)
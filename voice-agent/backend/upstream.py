@@ -0,0 +1,294 @@
+"""
+Shared upstream-call layer for OpenAI and Perplexity.
+
+Every call gets a deadline, retries 429/5xx/transport errors with jittered
+exponential backoff (honouring Retry-After), and can optionally send a hedged
+second request once the first has run past the recent p95 latency of the same
+model.
+
+A circuit breaker per (provider, model) opens after consecutive failures and
+fails fast until CIRCUIT_RESET_SECONDS have passed; then a single probe call is
+let through while everyone else keeps failing fast. Callers pass an ordered
+list of models, so while the primary is degraded the call falls through to a
+secondary model instead of waiting out the deadline.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, Sequence, Tuple, TypeVar
+
+import httpx
+
+from metrics import CIRCUIT_STATE, UPSTREAM_FALLBACKS, UPSTREAM_HEDGES, UPSTREAM_RETRIES, track_upstream
+
+T = TypeVar("T")
+
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+# Hedging needs this many recent successes before p95 is trusted
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# Total time budget per call, retries and fallbacks included
+DEADLINES = {
+    "openai": float(os.getenv("OPENAI_DEADLINE", "45")),
+    "perplexity": float(os.getenv("PERPLEXITY_DEADLINE", "60")),
+}
+# Hedged requests double the spend on slow calls, so they are opt-in per provider
+HEDGING = {
+    "openai": os.getenv("OPENAI_HEDGE", "0") == "1",
+    "perplexity": os.getenv("PERPLEXITY_HEDGE", "0") == "1",
+}
+
+RETRYABLE_STATUSES = {408, 409, 429}
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamError(Exception):
+    """Base class for failures raised by the upstream layer itself."""
+
+    status_code = 503
+
+
+class CircuitOpenError(UpstreamError):
+    """Every model for the call has an open circuit breaker."""
+
+
+class DeadlineExceeded(UpstreamError):
+    """The call's total time budget ran out."""
+
+    status_code = 504
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `reset_seconds` one probe call at a time is let through (half-open)."""
+
+    def __init__(self, provider: str, model: str, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.provider = provider
+        self.model = model
+        self.threshold = max(1, threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = CLOSED
+        self.probing = False  # a half-open probe is in flight
+        CIRCUIT_STATE.set(provider, model, value=_STATE_VALUES[CLOSED])
+
+    def _set(self, state: str) -> None:
+        if state != self.state:
+            print(f"Circuit {self.provider}/{self.model}: {self.state} -> {state}")
+        self.state = state
+        CIRCUIT_STATE.set(self.provider, self.model, value=_STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """True if a call may go ahead. In half-open only the first caller gets through, as the probe."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self._set(HALF_OPEN)
+        if self.state == OPEN:
+            return False
+        if self.state == HALF_OPEN:
+            if self.probing:
+                return False
+            self.probing = True
+        return True
+
+    def end_probe(self) -> None:
+        """Let another caller probe if this one ended without a verdict (e.g. a 400 or cancellation)."""
+        self.probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.probing = False
+        if self.state != CLOSED:
+            self._set(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        # A failed half-open probe re-opens immediately
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self._set(OPEN)
+
+
+class LatencyWindow:
+    """Rolling window of recent successful call latencies."""
+
+    def __init__(self, size: int = 200):
+        self.samples: deque = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+_breakers: dict[Tuple[str, str], CircuitBreaker] = {}
+_latencies: dict[Tuple[str, str, str], LatencyWindow] = {}  # (provider, operation, model)
+
+
+def get_breaker(provider: str, model: str) -> CircuitBreaker:
+    breaker = _breakers.get((provider, model))
+    if breaker is None:
+        breaker = _breakers[(provider, model)] = CircuitBreaker(provider, model)
+    return breaker
+
+
+def breaker_states() -> dict:
+    """{"provider/model": state} for every breaker seen so far."""
+    return {f"{p}/{m}": b.state for (p, m), b in _breakers.items()}
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(error: BaseException) -> bool:
+    """429, 5xx and transport failures are worth retrying; other 4xx are the caller's fault."""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES or status >= 500
+    if isinstance(error, httpx.TransportError):
+        return True
+    # openai.APIConnectionError / APITimeoutError don't subclass httpx errors
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, error: Optional[BaseException] = None) -> float:
+    """Full-jitter exponential backoff; a Retry-After header sets the floor."""
+    delay = random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+    retry_after = _retry_after(error) if error is not None else None
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, UPSTREAM_BACKOFF_MAX))
+    return delay
+
+
+async def _timed(provider: str, operation: str, model: str, attempt: Callable[[str], Awaitable[T]]) -> T:
+    start = time.monotonic()
+    with track_upstream(provider, operation):
+        result = await attempt(model)
+    window = _latencies.get((provider, operation, model))
+    if window is None:
+        window = _latencies[(provider, operation, model)] = LatencyWindow()
+    window.add(time.monotonic() - start)
+    return result
+
+
+async def _attempt_once(provider: str, operation: str, model: str, attempt: Callable[[str], Awaitable[T]], hedge: bool) -> T:
+    """One attempt; with hedging, a second identical request races the first once it passes the model's p95."""
+    window = _latencies.get((provider, operation, model))
+    hedge_after = window.p95() if hedge and window is not None else None
+    if hedge_after is None:
+        return await _timed(provider, operation, model, attempt)
+
+    tasks = {asyncio.ensure_future(_timed(provider, operation, model, attempt))}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            UPSTREAM_HEDGES.inc(provider, operation)
+            tasks.add(asyncio.ensure_future(_timed(provider, operation, model, attempt)))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _with_retries(provider: str, operation: str, model: str, attempt: Callable[[str], Awaitable[T]], breaker: CircuitBreaker, deadline_at: float, hedge: bool) -> T:
+    for attempt_no in range(max(1, UPSTREAM_MAX_ATTEMPTS)):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{provider} {operation} ran out of time")
+        try:
+            result = await asyncio.wait_for(_attempt_once(provider, operation, model, attempt, hedge), remaining)
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            raise DeadlineExceeded(f"{provider} {operation} exceeded its deadline") from None
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            breaker.record_failure()
+            delay = backoff_delay(attempt_no, e)
+            last_attempt = attempt_no + 1 >= UPSTREAM_MAX_ATTEMPTS
+            if last_attempt or not breaker.allow() or time.monotonic() + delay >= deadline_at:
+                raise
+            print(f"Retrying {provider} {operation} ({model}) in {delay:.2f}s after: {e}")
+            UPSTREAM_RETRIES.inc(provider, operation)
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+    raise AssertionError("unreachable")
+
+
+async def call_upstream(
+    provider: str,
+    operation: str,
+    attempt: Callable[[str], Awaitable[T]],
+    models: Sequence[str],
+    deadline: Optional[float] = None,
+    hedge: Optional[bool] = None,
+) -> Tuple[str, T]:
+    """
+    Run `attempt(model)` under the retry/deadline/breaker policy and return (model_used, result).
+
+    `models` is tried in order: the first is the primary, the rest are fallbacks
+    used when a model's breaker is open or it keeps failing with retryable errors.
+    Non-retryable errors (e.g. 400) are raised straight away.
+    """
+    deadline_at = time.monotonic() + (deadline if deadline is not None else DEADLINES.get(provider, 60))
+    hedge = HEDGING.get(provider, False) if hedge is None else hedge
+    last_error: Optional[BaseException] = None
+
+    for index, model in enumerate(models):
+        breaker = get_breaker(provider, model)
+        if not breaker.allow():
+            last_error = CircuitOpenError(f"{provider} circuit open for {model}")
+            continue
+        probe = breaker.state == HALF_OPEN  # allow() just made this call the probe
+        if index > 0:
+            print(f"Falling back to {provider} {model} for {operation}: {last_error}")
+            UPSTREAM_FALLBACKS.inc(provider, operation, model)
+        try:
+            return model, await _with_retries(provider, operation, model, attempt, breaker, deadline_at, hedge)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            last_error = e
+        finally:
+            if probe:
+                breaker.end_probe()
+
+    raise last_error if last_error is not None else ValueError("call_upstream needs at least one model")